@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import pandas as pd
+
+from joblib import Parallel, delayed
+from optbinning import OptimalBinning
+
+from Preprocessor import Preprocessor
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+def fit_variable(x, y, name, dtype, solver):
+
+    optb = OptimalBinning(name = name, dtype = dtype, solver = solver)
+    optb.fit(x, y)
+
+    return optb
+
+
+class BinningExplorer():
+
+
+    def __init__(self, set_seed, target, df, undersample, oot_year,
+                 solver = 'cp', n_jobs = -1):
+        self.set_seed: int = set_seed
+        self.target: str = target
+        self.df: pd.DataFrame = df
+        self.undersample: bool = undersample
+        self.oot_year: int = oot_year # format yyyymm.
+        self.solver: str = solver
+        self.n_jobs: int = n_jobs
+
+
+    def prepare(self):
+        ''' The function prepares the training sample once, with the same
+            oot, split and undersampling as the Preprocessor. The binning of
+            all variables is left out, the variables keep their raw values.
+            '''
+
+        preprocessor = Preprocessor(self.set_seed, self.target, self.df,
+                                    self.undersample, False, self.oot_year,
+                                    'woe')
+        preprocessor.retain_oot()
+        preprocessor.split_train_test()
+        self.df_train = preprocessor.undersample_train()
+
+        return self.df_train
+
+
+    def fit(self, variables):
+        ''' The function fits an optimal binning of every variable in
+            parallel worker processes.
+
+            Inputs:
+                - variables: dictionary of variable names and their binning
+                             dtype, 'numerical' or 'categorical'.
+                '''
+
+        y = self.df_train[self.target].to_numpy()
+
+        binned = Parallel(n_jobs = self.n_jobs)(
+            delayed(fit_variable)(self.df_train[name].to_numpy(), y, name,
+                                  dtype, self.solver)
+            for name, dtype in variables.items())
+
+        self.binned = dict(zip(variables, binned))
+        self.binning_tables = {name : optb.binning_table.build()
+                               for name, optb in self.binned.items()}
+
+        return self.binning_tables
+
+
+    def run(self, variables):
+
+        if not hasattr(self, 'df_train'):
+            self.prepare()
+        self.fit(variables)
+
+        return self.binning_tables
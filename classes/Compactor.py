@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import pandas as pd
+import numpy as np
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+class Compactor():
+
+
+    def __init__(self, df, var_map, rtol = 1e-6, atol = 0.005):
+        self.df: pd.DataFrame = df
+        self.var_map: pd.DataFrame = var_map
+        self.rtol: float = rtol # max. relative error of the float32 cast.
+        self.atol: float = atol # max. absolute error of amounts, half a cent.
+
+
+    def downcast_numeric(self, x, monetary = False):
+        ''' The function stores a numeric column in the smallest integer type
+            if it holds whole numbers only, otherwise in float32 if the
+            error of the cast stays within the tolerance. The error of
+            amounts is absolute, so that large amounts keep their cents and
+            stay in float64.
+
+            Inputs:
+                - x: numeric column,
+                - monetary: whether the column is an amount.
+                '''
+
+        values = x.to_numpy(dtype = 'float64', na_value = np.nan)
+
+        if not np.isnan(values).any() and np.array_equal(values,
+                                                          np.round(values)):
+            return pd.to_numeric(x, downcast = 'integer')
+
+        with np.errstate(over = 'ignore', invalid = 'ignore'):
+            error = np.abs(values.astype('float32') - values)
+        mask = ~np.isnan(values)
+        tolerance = self.atol if monetary else self.rtol * np.abs(values[mask])
+        if np.all(error[mask] <= tolerance):
+            return x.astype('float32')
+
+        return x
+
+
+    def downcast_flag(self, x):
+
+        # Flags with missing values cannot be stored as integers.
+        if x.isnull().any():
+            return x.astype('float32')
+
+        return x.astype('int8')
+
+
+    def compact(self):
+        ''' The function converts the columns according to the analytical
+            type of the mapping table: flags to int8, codes to category and
+            amounts, ratios, counts and scores to the smallest type which
+            keeps their precision.
+
+            Inputs:
+                - df: master dataset,
+                - var_map: mapping table.
+                '''
+
+        types = dict(zip(self.var_map['variable_name'],
+                         self.var_map['analytical_type_cd']))
+        before = self.df.memory_usage(index = False, deep = True)
+        dtypes_before = self.df.dtypes
+
+        for name in self.df.columns:
+            x = self.df[name]
+            analytical_type = types.get(name)
+
+            if analytical_type in ('flg', 'boolean'):
+                self.df[name] = self.downcast_flag(x)
+            elif analytical_type in ('str', 'date')\
+                or isinstance(x.dtype, pd.CategoricalDtype):
+                self.df[name] = x.astype('category')
+            elif pd.api.types.is_numeric_dtype(x)\
+                and not pd.api.types.is_bool_dtype(x):
+                self.df[name] = self.downcast_numeric(
+                    x, monetary = analytical_type == 'amt')
+
+        after = self.df.memory_usage(index = False, deep = True)
+
+        self.memory_report = pd.DataFrame({
+            'variable_name' : list(self.df.columns),
+            'dtype_before' : [str(dtypes_before[i]) for i in self.df.columns],
+            'dtype_after' : [str(i) for i in self.df.dtypes],
+            'memory_before' : before.values,
+            'memory_after' : after.values
+            })
+
+        return self.memory_report
+
+
+    def run(self):
+
+        self.compact()
+
+        print('Memory before: {:.1f} MB, after: {:.1f} MB'.format(
+            self.memory_report['memory_before'].sum() / 2**20,
+            self.memory_report['memory_after'].sum() / 2**20))
+
+        return (self.df, self.memory_report)
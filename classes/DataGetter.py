@@ -7,6 +7,11 @@
 #------------------------------------------------------------#
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from Recoder import Recoder, MARITAL_STATUS_MAP
+from Ingestor import ANALYTICAL_DTYPES, analytical_dtypes
 
 #------------------------------------------------------------#
 # STEP 2: definitions                                        #
@@ -16,9 +21,11 @@ import pandas as pd
 class DataGetter():
 
 
-    def __init__(self, df, var_map):
+    def __init__(self, df, var_map, value_map = None):
         self.df: pd.DataFrame = df
         self.var_map: pd.DataFrame = var_map
+        self.value_map: pd.DataFrame =\
+            MARITAL_STATUS_MAP if value_map is None else value_map
 
     
     def rename_columns(self):
@@ -43,7 +50,10 @@ class DataGetter():
         # This approach is however more robust to typos in that dataframe.
         helper = self.df.select_dtypes(include = 'boolean')
         
-        self.df[list(helper)] = self.df[list(helper)].astype(int)
+        # Flags with missing values cannot be stored as integers.
+        for name in helper:
+            self.df[name] = self.df[name].astype(
+                'float64' if self.df[name].isnull().any() else int)
         
         # Recode the variable names to type 'flg'.
         helper = pd.DataFrame(list(helper))
@@ -68,34 +78,28 @@ class DataGetter():
             
             Inputs:
                 - df: master dataset,
-                - var_map: mapping table. 
+                - value_map: mapping table of values. 
                 '''
 
-        self.df.loc[self.df['marital_status_cd'].isin(['Svobodn²(ß)']),
-                    'marital_status_cd'] = 'single'
-
-        self.df.loc[self.df['marital_status_cd'].isin(['Äenat²',
-                                                       'Vdanß',
-                                                       'Reg.partner']),
-                    'marital_status_cd'] = 'partnered'
-
-        self.df.loc[self.df['marital_status_cd'].isin(['Rozveden²(ß)']),
-                    'marital_status_cd'] = 'divorced'
-
-        self.df.loc[self.df['marital_status_cd'].isin(['Vdovec',
-                                                       'Vdova']),
-                    'marital_status_cd'] = 'widowed'
-
-        self.df.loc[self.df['marital_status_cd'].isin(['Nezadßno',
-                                                       'Zem°el(a)']),
-                    'marital_status_cd'] = 'other'
-        
-        self.df.loc[self.df['marital_status_cd'].isnull(),
-                    'marital_status_cd'] = 'other'
+        self.df = Recoder(self.value_map).recode(self.df, ['marital_status_cd'])
                 
         return self.df
     
     
+    def recode_values(self):
+        ''' The function re-codes all variables listed in the mapping table
+            of values, each of them in a single pass.
+            
+            Inputs:
+                - df: master dataset,
+                - value_map: mapping table of values. 
+                '''
+        
+        self.df = Recoder(self.value_map).recode(self.df)
+        
+        return self.df
+    
+    
     def exclude_features(self):
         ''' The function excludes variables according to a manually created
             mapping table.
@@ -108,15 +112,133 @@ class DataGetter():
         # The use flag was constructed manually by inspecting the variables.
         helper = self.var_map.loc[self.var_map['use_flg'] ==\
                                   0][['variable_name']]
-        self.df = self.df.drop(helper['variable_name'].values.tolist(), axis=1)
+        # Streamed chunks do not contain the excluded columns at all.
+        self.df = self.df.drop(helper['variable_name'].values.tolist(), axis=1,
+                               errors = 'ignore')
         return self.df
     
     
+    def select_columns(self):
+        ''' The function lists the source columns which survive the exclusion,
+            so that the excluded ones are not read at all.
+            
+            Inputs:
+                - var_map: mapping table. 
+                '''
+        
+        helper = self.var_map.loc[self.var_map['use_flg'] != 0]
+        self.use_columns = helper['source_variable_name'].values.tolist()
+        return self.use_columns
+    
+    
+    def read_chunks(self, path, chunksize, dtype):
+        ''' The function reads the source file in chunks. Both the source
+            text file and its parquet copy are supported.
+            
+            Inputs:
+                - path: path to a .csv or a .parquet file,
+                - chunksize: number of rows in a chunk,
+                - dtype: parse types of the source columns. 
+                '''
+        
+        use_columns = set(self.select_columns())
+        
+        if path.endswith('.parquet'):
+            source = pq.ParquetFile(path)
+            columns = [i for i in source.schema_arrow.names if i in use_columns]
+            dtype = {i : j for i, j in dtype.items() if i in columns}
+            for batch in source.iter_batches(batch_size = chunksize,
+                                             columns = columns):
+                yield batch.to_pandas().astype(dtype)
+        else:
+            reader = pd.read_csv(path,
+                                 decimal = ',',
+                                 delimiter = '|',
+                                 encoding = 'cp437',
+                                 dtype = dtype,
+                                 usecols = lambda i: i in use_columns,
+                                 chunksize = chunksize)
+            with reader:
+                for chunk in reader:
+                    yield chunk
+    
+    
+    def stream(self, path, chunksize = 100000, dtype = None):
+        ''' The function is the chunked variant of run(). It yields the
+            prepared chunks one by one, so that the whole dataset is never
+            held in memory.
+            
+            Inputs:
+                - path: path to a .csv or a .parquet file,
+                - chunksize: number of rows in a chunk,
+                - dtype: parse types of the source columns, by default those
+                  of the mapping table. 
+                '''
+        
+        # Every chunk starts from the source mapping table, as bool_to_flg
+        #  renames the boolean variables in it.
+        var_map = self.var_map.copy()
+        
+        # Types inferred per chunk differ between the chunks, eg. booleans
+        #  with missing values are read as objects and not renamed.
+        dtype = dtype or analytical_dtypes(var_map)
+        
+        for chunk in self.read_chunks(path, chunksize, dtype):
+            self.df = chunk
+            self.var_map = var_map.copy()
+            
+            self.rename_columns()
+            self.bool_to_flg()
+            self.recode_values()
+            self.exclude_features()
+            
+            # The flags of a chunk with missing values are floats, all
+            #  chunks get the parse type of the flags.
+            flags = self.var_map.loc[self.var_map['analytical_type_cd'] ==
+                                     'flg', 'variable_name']
+            flags = [i for i in flags if i in self.df.columns]
+            self.df[flags] = self.df[flags].astype(ANALYTICAL_DTYPES['flg'])
+            
+            yield self.df
+    
+    
+    def run_streaming(self, path, output_path, chunksize = 100000,
+                      dtype = None):
+        ''' The function prepares the source file chunk by chunk and writes
+            the result into a single parquet file.
+            
+            Inputs:
+                - path: path to a .csv or a .parquet file,
+                - output_path: path of the prepared parquet file,
+                - chunksize: number of rows in a chunk,
+                - dtype: parse types of the source columns, by default those
+                  of the mapping table. 
+                '''
+        
+        writer = None
+        
+        # The schema of the first chunk is pinned, every later chunk is
+        #  cast to it.
+        for chunk in self.stream(path, chunksize, dtype):
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index = False)
+                writer = pq.ParquetWriter(output_path, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema = writer.schema,
+                                             preserve_index = False)
+            writer.write_table(table)
+        
+        if writer is not None:
+            writer.close()
+        
+        return (output_path, self.var_map)
+    
+    
     def run(self):
         
         self.rename_columns()
         self.bool_to_flg()
-        self.wrangle_marital_status()
+        self.recode_values()
         self.exclude_features()
         
         return (self.df, self.var_map)
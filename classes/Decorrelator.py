@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import numpy as np
+
+from sklearn.feature_selection import f_classif
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+class Decorrelator():
+
+
+    def __init__(self, correlation_threshold = 0.5, scoring = f_classif,
+                 tol = 1e-3):
+        self.correlation_threshold: float = correlation_threshold
+        self.scoring = scoring
+        self.tol: float = tol # margin of the float64 recheck.
+
+
+    def correlate(self, X):
+        ''' The function computes the correlation matrix of all features at
+            once, as a single float32 matrix product of the centered data.
+            Constant features get NaN correlations.
+
+            Inputs:
+                - X: matrix of features.
+                '''
+
+        X = np.asarray(X, dtype = 'float32')
+        X_centered = X - X.mean(axis = 0, dtype = 'float64').astype('float32')
+        covariance = X_centered.T @ X_centered
+        std = np.sqrt(np.diag(covariance))
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            self.corr = covariance / np.outer(std, std)
+
+        return self.corr
+
+
+    def rank(self, X, y):
+        ''' The function orders the features by decreasing score. Ties keep
+            the column order and features with no score come last.
+            '''
+
+        self.scores = self.scoring(X, y)[0]
+        self.order = np.argsort(-self.scores, kind = 'stable')
+
+        return self.order
+
+
+    def recheck(self, X, feature, selected):
+
+        # np.corrcoef computes in float64.
+        return np.array([np.corrcoef(X[:, feature], X[:, i])[0, 1]
+                         for i in selected])
+
+
+    def fit(self, X, y):
+        ''' The function keeps the best scored feature and adds the next
+            ones as long as their absolute correlation with all kept features
+            stays below the threshold, as collinearity.SelectNonCollinear.
+
+            Inputs:
+                - X: matrix of features,
+                - y: target.
+                '''
+
+        X = np.asarray(X)
+        self.correlate(X)
+        self.rank(X, y)
+
+        selected = [self.order[0]]
+
+        for feature in self.order[1:]:
+            corr = np.abs(self.corr[feature, selected])
+
+            # Pairs close to the threshold are decided in float64.
+            borderline = np.abs(corr - self.correlation_threshold) <= self.tol
+            if borderline.any():
+                corr[borderline] = np.abs(self.recheck(
+                    X, feature, np.array(selected)[borderline]))
+
+            # Missing correlations, ie. constant features, are not kept.
+            if np.all(corr < self.correlation_threshold):
+                selected.append(feature)
+
+        self.mask_ = np.isin(np.arange(self.corr.shape[0]), selected)
+
+        return self
+
+
+    def get_support(self):
+
+        return self.mask_
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import numpy as np
+import pandas as pd
+
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import StratifiedKFold
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+def evaluate_candidate(estimator, X, y, folds, columns, inits, scoring):
+    ''' The function scores one set of features over all folds. The fit of
+        every fold starts from the coefficients of the previous step, the
+        coefficient of the new feature starts from zero.
+
+        Inputs:
+            - estimator: unfitted estimator,
+            - X, y: training data,
+            - folds: list of train and validation indices,
+            - columns: indices of the features, the candidate last,
+            - inits: coefficients and intercepts per fold or None,
+            - scoring: name of the sklearn scorer.
+            '''
+
+    scorer = get_scorer(scoring)
+    scores = []
+    coefs = []
+
+    for (train, test), init in zip(folds, inits):
+        model = clone(estimator)
+        if init is not None:
+            model.set_params(warm_start = True)
+            model.coef_ = np.append(init[0], 0)[None, :]
+            model.intercept_ = init[1]
+        model.fit(X[np.ix_(train, columns)], y[train])
+
+        scores.append(scorer(model, X[np.ix_(test, columns)], y[test]))
+        coefs.append((model.coef_[0], model.intercept_)
+                     if hasattr(model, 'coef_') else None)
+
+    return np.mean(scores), coefs
+
+
+class ForwardSelector():
+
+
+    def __init__(self, estimator, n_features_to_select = None, tol = None,
+                 cv = 5, scoring = 'roc_auc', n_jobs = -1, path = None):
+        self.estimator = estimator
+        self.n_features_to_select: int = n_features_to_select
+        self.tol: float = tol # min. improvement of the score per step.
+        self.cv: int = cv
+        self.scoring: str = scoring
+        self.n_jobs: int = n_jobs
+        self.path_: pd.DataFrame = path # selection path of an earlier fit.
+
+
+    def warm_startable(self):
+
+        return 'warm_start' in self.estimator.get_params()
+
+
+    def fit(self, X, y):
+        ''' The function adds one feature per step, the one with the best
+            cross-validated score, as the forward SequentialFeatureSelector.
+            The candidates of a step are evaluated in parallel. The selection
+            stops at n_features_to_select, or once the score improves by less
+            than tol. Without both it stops at half of the features.
+
+            Inputs:
+                - X: frame of features,
+                - y: target.
+                '''
+
+        self.feature_names_in_ = np.array(list(X), dtype = 'object')
+        n_features = len(self.feature_names_in_)
+        n_features_to_select = self.n_features_to_select or\
+            (n_features if self.tol is not None else n_features // 2)
+
+        # A path of an earlier fit on the same data is reused when long enough.
+        if self.path_ is not None and len(self.path_) >= n_features_to_select:
+            return self.select(n_features_to_select)
+
+        X = np.asarray(X, dtype = 'float64')
+        y = np.asarray(y)
+        folds = list(StratifiedKFold(self.cv).split(X, y))
+
+        selected = []
+        inits = [None] * self.cv
+        current_score = -np.inf
+        path = []
+
+        with Parallel(n_jobs = self.n_jobs) as parallel:
+            while len(selected) < n_features_to_select:
+                candidates = [i for i in range(n_features)
+                              if i not in selected]
+                results = parallel(
+                    delayed(evaluate_candidate)(self.estimator, X, y, folds,
+                                                selected + [i], inits,
+                                                self.scoring)
+                    for i in candidates)
+
+                # The first of equal scores wins, as in sklearn.
+                best = int(np.argmax([score for score, coefs in results]))
+                score, coefs = results[best]
+
+                if self.tol is not None and score - current_score < self.tol:
+                    break
+
+                selected.append(candidates[best])
+                current_score = score
+                if self.warm_startable():
+                    inits = coefs
+                path.append({'step' : len(selected),
+                             'feature' : self.feature_names_in_[
+                                 candidates[best]],
+                             'cv_score' : score})
+
+        self.path_ = pd.DataFrame(path, columns = ['step', 'feature',
+                                                   'cv_score'])
+
+        return self.select(len(self.path_))
+
+
+    def select(self, n_features_to_select):
+        ''' The function keeps the first features of the selection path,
+            with no refit.
+
+            Inputs:
+                - n_features_to_select: number of features to keep.
+                '''
+
+        features = list(self.path_['feature'].iloc[:n_features_to_select])
+        self.support_ = np.isin(self.feature_names_in_, features)
+
+        return self
+
+
+    def get_support(self):
+
+        return self.support_
+
+
+    def get_feature_names_out(self):
+
+        return self.feature_names_in_[self.support_]
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import os
+import hashlib
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from Recoder import MARITAL_STATUS_MAP
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+# Explicit parse types per analytical type of the mapping table. Numeric
+#  types are read as float, because most of them contain missing values.
+ANALYTICAL_DTYPES = {
+    'amt' : 'float64',
+    'ratio' : 'float64',
+    'count' : 'float64',
+    'int' : 'float64',
+    'flg' : 'float64',
+    'boolean' : 'boolean',
+    'str' : 'object',
+    'date' : 'object',
+    'yyyymm' : 'int64'
+    }
+
+
+def analytical_dtypes(var_map):
+    ''' The function derives the parse types of the source columns from
+        the analytical_type_cd column of the mapping table. Columns of an
+        unknown analytical type are left to pandas to infer.
+
+        Inputs:
+            - var_map: mapping table of the variables.
+            '''
+
+    helper = var_map.loc[var_map['analytical_type_cd']\
+                         .isin(list(ANALYTICAL_DTYPES))]
+
+    return dict(zip(helper['source_variable_name'],
+                    helper['analytical_type_cd'].map(ANALYTICAL_DTYPES)))
+
+
+class Ingestor():
+
+
+    def __init__(self, data_path, mapping_path, cache_dir,
+                 sheet_name = 'variables', value_sheet_name = 'value_mapping'):
+        self.data_path: str = data_path
+        self.mapping_path: str = mapping_path
+        self.cache_dir: str = cache_dir
+        self.sheet_name: str = sheet_name
+        self.value_sheet_name: str = value_sheet_name
+
+
+    def hash_file(self, path):
+        ''' The function hashes the content of a file in blocks, so that
+            large snapshots are never held in memory as a whole.
+
+            Inputs:
+                - path: path to the hashed file.
+                '''
+
+        sha = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+
+        return sha.hexdigest()
+
+
+    def cache_path(self, key, name):
+
+        os.makedirs(self.cache_dir, exist_ok = True)
+
+        return os.path.join(self.cache_dir, f'{name}_{key}.parquet')
+
+
+    def write_cache(self, df, path):
+
+        # Write aside first, so that an interrupted run leaves no
+        #  truncated file behind.
+        df.to_parquet(path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+
+    def load_sheet(self, sheet_name):
+        ''' The function loads one sheet of the mapping tables, either from
+            the columnar cache or from the source excel file.
+
+            Inputs:
+                - sheet_name: name of the loaded sheet.
+                '''
+
+        key = self.hash_file(self.mapping_path)
+        path = self.cache_path(key, sheet_name)
+
+        if os.path.exists(path):
+            sheet = pd.read_parquet(path)
+        else:
+            sheet = pd.read_excel(self.mapping_path, sheet_name = sheet_name)
+            self.write_cache(sheet, path)
+
+        return sheet
+
+
+    def load_var_map(self):
+
+        self.var_map = self.load_sheet(self.sheet_name)
+
+        return self.var_map
+
+
+    def load_value_map(self):
+        ''' The function loads the mapping table of values. The source
+            mapping tables have no such sheet, their values are recoded by
+            the built-in mapping.
+            '''
+
+        try:
+            self.value_map = self.load_sheet(self.value_sheet_name)
+        except ValueError:
+            self.value_map = MARITAL_STATUS_MAP.copy()
+
+        return self.value_map
+
+
+    def build_dtypes(self):
+
+        self.dtypes = analytical_dtypes(self.var_map)
+
+        return self.dtypes
+
+
+    def load_data(self):
+        ''' The function loads the master dataset. The text file is parsed
+            only if no cache exists for its content and parse types.
+            '''
+
+        # The key covers the parse types too, so that an edit of the
+        #  mapping table invalidates the cache.
+        key = self.hash_file(self.data_path)
+        key = hashlib.sha1((key + repr(sorted(self.dtypes.items())))\
+                           .encode()).hexdigest()
+        path = self.cache_path(key, 'dataset')
+
+        if os.path.exists(path):
+            self.df = pd.read_parquet(path)
+        else:
+            self.df = pd.read_csv(self.data_path,
+                                  decimal = ',',
+                                  delimiter = '|',
+                                  encoding = 'cp437',
+                                  dtype = self.dtypes)
+            self.write_cache(self.df, path)
+
+        return self.df
+
+
+    def month_column(self):
+
+        return self.var_map.loc[self.var_map['analytical_type_cd'] ==
+                                'yyyymm', 'source_variable_name'].iloc[0]
+
+
+    def write_partitions(self, partition_dir):
+        ''' The function stores the loaded dataset as parquet partitions by
+            month, eg. a delivery of new months. The stored months of the
+            dataset are replaced, the others are kept.
+
+            Inputs:
+                - partition_dir: directory of the partitions.
+                '''
+
+        pq.write_to_dataset(pa.Table.from_pandas(self.df,
+                                                 preserve_index = False),
+                            partition_dir,
+                            partition_cols = [self.month_column()],
+                            existing_data_behavior = 'delete_matching')
+
+        return partition_dir
+
+
+    def partition_months(self, partition_dir):
+        ''' The function lists the stored months from the names of the
+            partitions, with no data read.
+            '''
+
+        prefix = f'{self.month_column()}='
+        if not os.path.exists(partition_dir):
+            return []
+
+        return sorted(int(i[len(prefix):]) for i in os.listdir(partition_dir)
+                      if i.startswith(prefix))
+
+
+    def load_partitions(self, partition_dir, months):
+        ''' The function loads the partitions of some months only, so that
+            the cost follows the rows of these months, not of the whole
+            dataset.
+
+            Inputs:
+                - partition_dir: directory of the partitions,
+                - months: loaded months, format yyyymm.
+                '''
+
+        column = self.month_column()
+        self.df = pd.read_parquet(partition_dir,
+                                  filters = [(column, 'in',
+                                              [int(i) for i in months])])
+        # The month comes back as a category of the partition names.
+        self.df[column] = self.df[column].astype(ANALYTICAL_DTYPES['yyyymm'])
+
+        return self.df
+
+
+    def run(self):
+
+        self.load_var_map()
+        self.load_value_map()
+        self.build_dtypes()
+        self.load_data()
+
+        return (self.df, self.var_map, self.value_map)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import numpy as np
+import pandas as pd
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+def compute_metrics(y, y_pred):
+    ''' The function sorts the scores once and derives the ROC curve, AUC,
+        Gini, CAP curve and KS statistic from the same cumulative counts.
+        Tied scores form one point of the curves, as in sklearn roc_curve,
+        so the AUC equals roc_auc_score.
+
+        Inputs:
+            - y: binary target,
+            - y_pred: scores, a higher score for a default.
+            '''
+
+    y = np.asarray(y, dtype = 'float64').ravel()
+    y_pred = np.asarray(y_pred).ravel()
+
+    order = np.argsort(y_pred, kind = 'mergesort')[::-1]
+    y_pred = y_pred[order]
+    y = y[order]
+
+    # The last row of every group of tied scores.
+    ends = np.r_[np.flatnonzero(np.diff(y_pred)), y.size - 1]
+    tps = np.cumsum(y)[ends]
+    fps = 1 + ends - tps
+    thresholds = y_pred[ends]
+
+    # Collinear points add nothing to the curves, as drop_intermediate.
+    if tps.size > 2:
+        keep = np.flatnonzero(np.r_[True, np.logical_or(np.diff(fps, 2),
+                                                        np.diff(tps, 2)),
+                                    True])
+        tps, fps, thresholds = tps[keep], fps[keep], thresholds[keep]
+
+    tps = np.r_[0, tps]
+    fps = np.r_[0, fps]
+    thresholds = np.r_[np.inf, thresholds]
+
+    positives, negatives = tps[-1], fps[-1]
+    tpr = tps / positives
+    fpr = fps / negatives
+    # Trapezoidal rule, as sklearn auc.
+    roc_auc = (np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2.0).sum()
+    ks_id = int(np.argmax(tpr - fpr))
+    # With no separating threshold, eg. constant scores, the KS is 0 at the
+    #  start of the curves, which has no threshold.
+    ks_threshold = thresholds[ks_id] if ks_id > 0 else np.nan
+
+    return {'n' : y.size,
+            'positives' : positives,
+            'thresholds' : thresholds,
+            'fpr' : fpr,
+            'tpr' : tpr,
+            'auc' : roc_auc,
+            'gini' : 2 * roc_auc - 1,
+            'cap_x' : (tps + fps) / y.size,
+            'cap_y' : tpr,
+            'ks' : tpr[ks_id] - fpr[ks_id],
+            'ks_threshold' : ks_threshold,
+            'ks_id' : ks_id}
+
+
+def evaluate(targets, scores, model_names = None):
+    ''' The function computes the metrics of all models on all samples, with
+        no plotting.
+
+        Inputs:
+            - targets: dictionary of the target per sample,
+            - scores: dictionary of the score matrix, rows by models, per
+              sample,
+            - model_names: names of the columns of the score matrices.
+            '''
+
+    curves = {}
+    table = []
+
+    for sample, y in targets.items():
+        matrix = np.asarray(scores[sample])
+        for i in range(matrix.shape[1]):
+            model = model_names[i] if model_names is not None else i
+            curves[model, sample] = compute_metrics(y, matrix[:, i])
+            table.append({'model' : model, 'sample' : sample,
+                          **{key : curves[model, sample][key]
+                             for key in ['auc', 'gini', 'ks',
+                                         'ks_threshold']}})
+
+    return curves, pd.DataFrame(table)
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import os
+import re
+import json
+import shutil
+import datetime
+
+import numpy as np
+import pandas as pd
+import joblib
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+# File names of the legacy dumps, eg. 3_rf.joblib.
+LEGACY_PATTERN = re.compile(r'^(\d+)_([a-z]+)\.joblib$')
+
+
+def to_json(value):
+    ''' The function converts the values of a manifest which json does not
+        know, numpy scalars to numbers and estimators to their repr.
+        '''
+
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+
+    return repr(value)
+
+
+class ModelRegistry():
+
+
+    def __init__(self, registry_dir):
+        self.registry_dir: str = registry_dir
+
+        os.makedirs(self.registry_dir, exist_ok = True)
+
+
+    def entry_dir(self, name):
+
+        return os.path.join(self.registry_dir, name)
+
+
+    def entry_name(self, scenario_id, family, prefix = ''):
+        ''' The function returns the name of an entry. The prefix keeps sets
+            of models with the same scenarios apart, eg. 'errata_'.
+            '''
+
+        return f'{prefix}{scenario_id}_{family}'
+
+
+    def path(self, scenario_id, family, prefix = ''):
+        ''' The function returns the path of the slim estimator, eg. to score
+            it with the Validator.
+            '''
+
+        return os.path.join(self.entry_dir(self.entry_name(scenario_id, family,
+                                                           prefix)),
+                            'estimator.joblib')
+
+
+    def register(self, model, scenario_id, family, metrics = None,
+                 features = None, source = None, prefix = '',
+                 overwrite = False):
+        ''' The function stores a fitted model as three files: the best
+            estimator alone, uncompressed so that its arrays can be memory-
+            mapped, the cross-validation results as a table and a small json
+            manifest of the parameters, metrics and features.
+
+            Inputs:
+                - model: fitted search or estimator,
+                - scenario_id: scenario of the model,
+                - family: model family, eg. 'rf',
+                - metrics: dictionary of metrics, eg. the AUCs per sample,
+                - features: names of the features,
+                - source: path of the legacy dump, if imported,
+                - prefix: prefix of the entry name, eg. 'errata_',
+                - overwrite: whether an existing entry is replaced.
+                '''
+
+        name = self.entry_name(scenario_id, family, prefix)
+        directory = self.entry_dir(name)
+
+        # A replaced entry is removed as a whole, so that no file of the old
+        #  model, eg. its bundle, is left next to the new one.
+        if os.path.exists(directory):
+            if not overwrite:
+                raise FileExistsError(f'The entry {name} is registered '
+                                      'already, pass overwrite = True.')
+            shutil.rmtree(directory)
+        os.makedirs(directory)
+
+        estimator = getattr(model, 'best_estimator_', model)
+        joblib.dump(estimator, os.path.join(directory, 'estimator.joblib'))
+
+        files = {'estimator' : 'estimator.joblib'}
+        if hasattr(model, 'cv_results_'):
+            cv_results = pd.DataFrame(model.cv_results_)
+            cv_results['params'] = cv_results['params'].astype(str)
+            cv_results.to_csv(os.path.join(directory, 'cv_results.csv'),
+                              index = False)
+            files['cv_results'] = 'cv_results.csv'
+
+        if features is None and hasattr(estimator, 'feature_names_in_'):
+            features = list(estimator.feature_names_in_)
+
+        manifest = {'name' : name,
+                    'scenario_id' : scenario_id,
+                    'family' : family,
+                    'prefix' : prefix,
+                    'estimator' : type(estimator).__name__,
+                    'best_params' : getattr(model, 'best_params_', None),
+                    'best_score' : getattr(model, 'best_score_', None),
+                    'metrics' : metrics or {},
+                    'n_features' : getattr(estimator, 'n_features_in_', None),
+                    'features' : features,
+                    'files' : files,
+                    'estimator_bytes' : os.path.getsize(
+                        os.path.join(directory, 'estimator.joblib')),
+                    'source' : source,
+                    'created' : datetime.datetime.now().isoformat(
+                        timespec = 'seconds')}
+
+        # The manifest comes last, an entry without it is incomplete.
+        manifest_path = os.path.join(directory, 'manifest.json')
+        with open(manifest_path + '.tmp', 'w') as file:
+            json.dump(manifest, file, indent = 1, default = to_json)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+        return manifest
+
+
+    def bundle_path(self, scenario_id, family, prefix = ''):
+
+        return os.path.join(self.entry_dir(self.entry_name(scenario_id, family,
+                                                           prefix)),
+                            'bundle.joblib')
+
+
+    def register_bundle(self, bundle, scenario_id, family, prefix = ''):
+        ''' The function stores the scoring bundle of a registered model, ie.
+            the output of ScoringService.make_bundle, next to its estimator
+            and notes it in the manifest.
+
+            Inputs:
+                - bundle: scoring bundle of the model,
+                - scenario_id: scenario of the model,
+                - family: model family, eg. 'rf',
+                - prefix: prefix of the entry name.
+                '''
+
+        path = self.bundle_path(scenario_id, family, prefix)
+        joblib.dump(bundle, path)
+
+        manifest_path = os.path.join(self.entry_dir(self.entry_name(
+            scenario_id, family, prefix)), 'manifest.json')
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+        manifest['files']['bundle'] = 'bundle.joblib'
+        with open(manifest_path + '.tmp', 'w') as file:
+            json.dump(manifest, file, indent = 1, default = to_json)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+        return path
+
+
+    def manifests(self):
+
+        manifests = []
+
+        for name in sorted(os.listdir(self.registry_dir)):
+            path = os.path.join(self.entry_dir(name), 'manifest.json')
+            if os.path.exists(path):
+                with open(path) as file:
+                    manifests.append(json.load(file))
+
+        return manifests
+
+
+    def list(self):
+        ''' The function lists the registered models from their manifests
+            only, with no estimator loaded.
+            '''
+
+        rows = [{**{key : manifest.get(key, '')
+                    for key in ['name', 'prefix', 'scenario_id', 'family',
+                                'estimator', 'best_score', 'n_features',
+                                'estimator_bytes']},
+                 **manifest['metrics']}
+                for manifest in self.manifests()]
+
+        return pd.DataFrame(rows)
+
+
+    def compare(self, metric = 'oot_auc'):
+        ''' The function tabulates a metric of all models by set of models,
+            scenario and family, from the manifests.
+
+            Inputs:
+                - metric: key of the metrics, or 'best_score'.
+                '''
+
+        return self.list().pivot(index = ['prefix', 'scenario_id'],
+                                 columns = 'family', values = metric)
+
+
+    def load(self, scenario_id, family, prefix = '', mmap_mode = 'r'):
+        ''' The function loads the slim estimator of a model. Its arrays are
+            memory-mapped read-only by default, ie. read from disk on use.
+            '''
+
+        return joblib.load(self.path(scenario_id, family, prefix),
+                           mmap_mode = mmap_mode)
+
+
+    def cv_results(self, scenario_id, family, prefix = ''):
+
+        return pd.read_csv(os.path.join(self.entry_dir(self.entry_name(
+            scenario_id, family, prefix)), 'cv_results.csv'))
+
+
+    def import_legacy(self, model_dir, metrics = None, prefix = '',
+                      overwrite = False):
+        ''' The function registers the legacy dumps of whole searches, named
+            {scenario}_{family}.joblib, eg. of models/ or errata/models/. Sets
+            of dumps with the same scenarios need their own prefixes, eg.
+            'errata_' for errata/models/.
+
+            Inputs:
+                - model_dir: directory of the dumps,
+                - metrics: optional table with scenario_id, model and metric
+                  columns, as the output of the ScenarioRunner,
+                - prefix: prefix of the entry names,
+                - overwrite: whether existing entries are replaced.
+                '''
+
+        manifests = []
+
+        for file_name in sorted(os.listdir(model_dir)):
+            match = LEGACY_PATTERN.match(file_name)
+            if match is None:
+                continue
+            scenario_id, family = int(match.group(1)), match.group(2)
+
+            model_metrics = None
+            if metrics is not None:
+                rows = metrics[(metrics['scenario_id'] == scenario_id) &
+                               (metrics['model'] == family)]
+                model_metrics = rows.filter(like = '_auc').iloc[0].to_dict()\
+                    if len(rows) else None
+
+            path = os.path.join(model_dir, file_name)
+            manifests.append(self.register(joblib.load(path), scenario_id,
+                                           family, model_metrics,
+                                           source = path, prefix = prefix,
+                                           overwrite = overwrite))
+
+        return manifests
@@ -7,18 +7,32 @@
 #------------------------------------------------------------#
 
 import pandas as pd
+import numpy as np
+import scipy.sparse as sp
 
-from sklearn.feature_selection import SequentialFeatureSelector
+from ForwardSelector import ForwardSelector
 from sklearn.linear_model import LogisticRegression
 import statsmodels.api as sm
 from sklearn.model_selection import GridSearchCV
+from sklearn.model_selection import RandomizedSearchCV, ParameterGrid
+from sklearn.experimental import enable_halving_search_cv
+from sklearn.model_selection import HalvingGridSearchCV
 from sklearn.neural_network import MLPClassifier
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.ensemble import BaggingClassifier
 from sklearn.ensemble import AdaBoostClassifier
-from sklearn.svm import SVC
+from sklearn.svm import SVC, LinearSVC
+from sklearn.kernel_approximation import Nystroem
+from sklearn.pipeline import Pipeline
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.base import clone
+from sklearn.preprocessing import OneHotEncoder
+
+from Scheduler import Scheduler
+from NeighborSearch import KNNSearch
+from WarmStartSearch import WarmStartSearch
 
 #------------------------------------------------------------#
 # STEP 2: definitions                                        #
@@ -29,25 +43,40 @@ class Modeler():
     
     
     def __init__(self, set_seed, target, decorrelate, 
-                 df_train, df_test, df_oot):
+                 df_train, df_test, df_oot, n_jobs = -1,
+                 search_strategy = 'grid', search_budget = 20,
+                 svm_engine = 'kernel', n_components = 300,
+                 knn_index = None, ensemble_search = 'grid'):
         self.set_seed: int = set_seed
         self.target: str = target
         self.decorrelate: bool = decorrelate
         self.df_train: pd.DataFrame = df_train
         self.df_test: pd.DataFrame = df_test
         self.df_oot: pd.DataFrame = df_oot
+        self.n_jobs: int = n_jobs # cores of the grid searches.
+        self.search_strategy: str = search_strategy # 'grid', 'halving' or 'random'.
+        self.search_budget: int = search_budget # candidates of the random search.
+        self.svm_engine: str = svm_engine # 'kernel' or 'approximate'.
+        self.n_components: int = n_components # size of the kernel approximation.
+        self.knn_index = knn_index # None, 'exact' or 'nndescent' neighbour index.
+        self.ensemble_search: str = ensemble_search # 'grid' or 'warm_start'.
     
     
-    def select_features(self, selection_metric, select_features_bool):
+    def select_features(self, selection_metric, select_features_bool,
+                        n_features_to_select = None, tol = None, path = None):
         
         if select_features_bool:
                     
-            # Define algorithms
-            sfs = SequentialFeatureSelector(selection_metric,
-                                            #n_features_to_select = 15,
-                                            scoring = 'roc_auc',
-                                            direction = 'forward',
-                                            cv = 5)
+            # Define algorithms. The candidates of a step are fitted in
+            #  parallel, warm started from the previous step. A path of an
+            #  earlier run is cut to a smaller n_features_to_select.
+            sfs = ForwardSelector(selection_metric,
+                                  n_features_to_select = n_features_to_select,
+                                  tol = tol,
+                                  scoring = 'roc_auc',
+                                  cv = 5,
+                                  n_jobs = self.n_jobs,
+                                  path = path)
     
             # Define y on all samples.
             self.y_test = self.df_test.loc[:, self.target]
@@ -67,6 +96,7 @@ class Modeler():
             self.X_oot = self.df_oot[list(sfs.get_feature_names_out())]
             
             print(list(sfs.get_feature_names_out()))
+            self.selection_path = sfs.path_
             
         else:
             
@@ -89,34 +119,172 @@ class Modeler():
         
         if encoding_metric == 'bins':
 
-            ### Categorize.
-            self.X_train = self.X_train.astype('category')
-            self.X_test = self.X_test.astype('category')
-            self.X_oot = self.X_oot.astype('category')
-
-            ### Apply one-hot.
-            self.X_train = pd.get_dummies(self.X_train)
-            self.X_test = pd.get_dummies(self.X_test)
-            self.X_oot = pd.get_dummies(self.X_oot)
-
-            # Keep only the interseciton of variables.
-            inter = set(self.X_train).intersection(self.X_test, self.X_oot)
-            
-            self.X_train = self.X_train[list(inter)]
-            self.X_test = self.X_test[list(inter)]
-            self.X_oot = self.X_oot[list(inter)]
+            # The bins are learned on train once. Bins seen only in test or
+            #  oot are encoded as zeros, all samples get the same columns in
+            #  the order of the encoder. All estimators take the sparse
+            #  matrices as they are.
+            self.one_hot_encoder = OneHotEncoder(handle_unknown = 'ignore',
+                                                 sparse_output = True,
+                                                 dtype = np.float32)
+            self.X_train = self.one_hot_encoder.fit_transform(self.X_train)
+            self.X_test = self.transform_one_hot(self.X_test)
+            self.X_oot = self.transform_one_hot(self.X_oot)
+            self.feature_names = list(
+                self.one_hot_encoder.get_feature_names_out())
         
         else:
-            pass
+            self.feature_names = list(self.X_train)
         
         return (self.X_train, self.X_test, self.X_oot)  
     
-    def model_logit(self):
+    
+    def transform_one_hot(self, X, batch_size = 100000):
+        ''' The function encodes a sample with the bins learned on train, in
+            batches of rows, eg. new data to be scored.
+            
+            Inputs:
+                - X: frame of the selected features,
+                - batch_size: number of rows encoded at once.
+                '''
+        
+        batches = [self.one_hot_encoder.transform(X.iloc[i:i + batch_size])
+                   for i in range(0, len(X), batch_size)]
+        
+        return sp.vstack(batches, format = 'csr') if batches else\
+            self.one_hot_encoder.transform(X)
+    
+    
+    def define_models(self):
+        ''' The function defines the estimator and the hyperparameter grid of
+            every model family, shared by the grid searches of the model_*
+            functions and by the scheduler. A family without a grid is
+            fitted once.
+            '''
         
         if self.decorrelate:
+            logit = (LogisticRegression(solver = 'saga', max_iter = 1000,
+                                        penalty = None), None)
+        else:
+            logit = (LogisticRegression(solver = 'saga', max_iter = 1000,
+                                        penalty = 'elasticnet'),
+                     {'l1_ratio' : [(0), (0.1), (0.2), (0.3), (0.4), (0.5),
+                                    (0.6), (0.7), (0.8), (0.9), (1)]})
+        
+        ann = (MLPClassifier(max_iter = 1000, random_state = self.set_seed,
+                             early_stopping = True),
+               {'hidden_layer_sizes': [(7),
+                                       (5, 5),
+                                       (7, 7),
+                                       (10, 5),
+                                       (10, 10),
+                                       (20, 20),
+                                       (40, 40, 20),
+                                       (40, 20, 20),
+                                       (20, 40, 20),
+                                       (100, 200, 100),
+                                       (200, 100, 100),
+                                       (200, 200, 100),
+                                       (200, 400, 200)],
+                'activation': ['logistic', 'tanh', 'relu'],
+                'solver': ['adam'],
+                'learning_rate': ['constant', 'invscaling', 'adaptive']})
+        
+        knn = (KNeighborsClassifier(),
+               {'n_neighbors' : [1, 5, 10, 30, 50, 100],
+                'weights' : ('uniform', 'distance'),
+                'p' : [(1), (2)]})
+        
+        # The degree applies to the poly kernel only, C must be positive.
+        svm_costs = [(0.25), (0.5), (0.75), (1)]
+        if self.svm_engine == 'approximate':
+            # Linear SVM on a fixed number of kernel features, its memory
+            #  grows linearly with the sample, not quadratically.
+            nystroem = {kernel : Nystroem(kernel = kernel,
+                                          n_components = self.n_components,
+                                          random_state = self.set_seed)
+                        for kernel in ['poly', 'rbf', 'sigmoid']}
+            svm = (Pipeline([('features', 'passthrough'),
+                             ('svc', LinearSVC(random_state = self.set_seed))]),
+                   [{'features' : ['passthrough'], 'svc__C' : svm_costs},
+                    {'features' : [nystroem['poly']],
+                     'features__degree' : [(1), (2), (3)],
+                     'svc__C' : svm_costs},
+                    {'features' : [nystroem['rbf'], nystroem['sigmoid']],
+                     'svc__C' : svm_costs}])
+        else:
+            svm = (SVC(max_iter = 1000, cache_size = 5000),
+                   [{'kernel' : ('linear', 'rbf', 'sigmoid'),
+                     'C' : svm_costs},
+                    {'kernel' : ('poly',),
+                     'degree' : [(1), (2), (3)],
+                     'C' : svm_costs}])
+        
+        bag = (BaggingClassifier(random_state = self.set_seed),
+               {'n_estimators': [10, 20, 30, 50, 100, 150]})
+        
+        rf = (RandomForestClassifier(random_state = self.set_seed),
+              {'bootstrap' : [True],
+               'max_depth' : [1, 2, 3, 4, 5, 10, 15],
+               'min_samples_leaf' : [10],
+               'n_estimators': [10, 20, 30, 50, 100, 150]})
+        
+        adaboost = (AdaBoostClassifier(random_state = self.set_seed),
+                    {'n_estimators': [10, 20, 30, 50, 100, 150]})
+        
+        return {'logit' : logit, 'ann' : ann, 'knn' : knn, 'svm' : svm,
+                'bag' : bag, 'rf' : rf, 'adaboost' : adaboost}
+    
+    
+    def make_search(self, estimator, hyperparameter_grid):
+        ''' The function defines the hyperparameter search of a model family.
+            The grid is searched exhaustively, by successive halving, which
+            fits all candidates on a small sample and only the best ones on
+            more, or randomly up to the budget of candidates. All families
+            are halved on the sample size: the ANN stops early, so max_iter
+            hardly limits its fits, and the ensembles search n_estimators
+            in their grids.
+            
+            Inputs:
+                - estimator: unfitted estimator,
+                - hyperparameter_grid: search space.
+                '''
+        
+        if self.search_strategy == 'halving':
+            return HalvingGridSearchCV(estimator, hyperparameter_grid,
+                                       factor = 3, cv = 5,
+                                       random_state = self.set_seed,
+                                       n_jobs = self.n_jobs)
+        
+        if self.search_strategy == 'random':
+            n_iter = min(self.search_budget,
+                         len(ParameterGrid(hyperparameter_grid)))
+            return RandomizedSearchCV(estimator, hyperparameter_grid,
+                                      n_iter = n_iter, cv = 5,
+                                      random_state = self.set_seed,
+                                      n_jobs = self.n_jobs)
+        
+        return GridSearchCV(estimator, hyperparameter_grid,
+                            n_jobs = self.n_jobs, cv = 5)
+    
+    
+    def print_search(self, search, best_params = False):
+        
+        if best_params:
+            print('Best parameters found:\n', search.best_params_)
+        
+        for mean, std, params in zip(search.cv_results_['mean_test_score'],
+                                     search.cv_results_['std_test_score'],
+                                     search.cv_results_['params']):
+            print("%0.3f (+/-%0.03f) for %r" % (mean, std * 2, params))
+    
+    
+    def model_logit(self):
+        
+        estimator, hyperparameter_grid = self.define_models()['logit']
+        
+        if hyperparameter_grid is None:
 
-            self.logit = LogisticRegression(solver = 'saga', max_iter = 1000,
-                                            penalty = None)
+            self.logit = estimator
             
             self.logit.fit(self.X_train, self.y_train)
     
@@ -125,16 +293,7 @@ class Modeler():
         
         else:
 
-            self.logit = LogisticRegression(solver = 'saga', max_iter = 1000,
-                                            penalty = 'elasticnet')
-            
-            hyperparameter_grid = {
-                'l1_ratio' : [(0), (0.1), (0.2), (0.3), (0.4), (0.5),
-                              (0.6), (0.7), (0.8), (0.9), (1)]
-                }
-            
-            self.logit = GridSearchCV(self.logit, hyperparameter_grid, 
-                                      n_jobs = -1, cv = 5)
+            self.logit = self.make_search(estimator, hyperparameter_grid)
 
             self.logit.fit(self.X_train, self.y_train)
 
@@ -143,159 +302,179 @@ class Modeler():
     
     def model_ann(self):
         
-        mlp = MLPClassifier(max_iter = 1000, random_state = self.set_seed,
-                            early_stopping = True)
-        
-        hyperparameter_grid = {
-            'hidden_layer_sizes': [(7),
-                                   (5, 5),
-                                   (7, 7),
-                                   (10, 5),
-                                   (10, 10),
-                                   (20, 20),
-                                   (40, 40, 20),
-                                   (40, 20, 20),
-                                   (20, 40, 20),
-                                   (100, 200, 100),
-                                   (200, 100, 100),
-                                   (200, 200, 100),
-                                   (200, 400, 200)],
-            'activation': ['logistic', 'tanh', 'relu'],
-            'solver': ['adam'],
-            'learning_rate': ['constant', 'invscaling', 'adaptive'],
-        }
-        
-        self.ann = GridSearchCV(mlp, hyperparameter_grid, n_jobs = -1, cv = 5)
+        mlp, hyperparameter_grid = self.define_models()['ann']
         
-        self.ann.fit(self.X_train, self.y_train)
+        self.ann = self.make_search(mlp, hyperparameter_grid)
         
-        print('Best parameters found:\n', self.ann.best_params_)
+        self.ann.fit(self.X_train, self.y_train)
         
-        for mean, std, params in zip(self.ann.cv_results_['mean_test_score'],
-                                     self.ann.cv_results_['std_test_score'],
-                                     self.ann.cv_results_['params']):
-            print("%0.3f (+/-%0.03f) for %r" % (mean, std * 2, params))    
+        self.print_search(self.ann, best_params = True)
             
         return self.ann
     
  
     def model_knn(self):
 
-        hyperparameter_grid = {
-            'n_neighbors' : [1, 5, 10, 30, 50, 100],
-            'weights' : ('uniform', 'distance'),
-            'p' : [(1), (2)]
-            }
+        knn, hyperparameter_grid = self.define_models()['knn']
         
-        self.knn = GridSearchCV(KNeighborsClassifier(), hyperparameter_grid, 
-                                n_jobs = -1, cv = 5)
-        self.knn.fit(self.X_train, self.y_train)
+        if self.knn_index is not None:
+            # One neighbour query per fold and distance serves all k and
+            #  weights of the grid.
+            self.knn = KNNSearch(hyperparameter_grid, cv = 5,
+                                 index = self.knn_index, n_jobs = self.n_jobs)\
+                .fit(self.X_train, self.y_train)
+        else:
+            self.knn = self.make_search(knn, hyperparameter_grid)
+            self.knn.fit(self.X_train, self.y_train)
 
-        print('Best parameters found:\n', self.knn.best_params_)
-        
-        for mean, std, params in zip(self.knn.cv_results_['mean_test_score'],
-                                     self.knn.cv_results_['std_test_score'],
-                                     self.knn.cv_results_['params']):
-            print("%0.3f (+/-%0.03f) for %r" % (mean, std * 2, params))
+        self.print_search(self.knn, best_params = True)
         
         return self.knn
 
 
     def model_svm(self):    
 
-        svc = SVC(max_iter = 1000, probability = True, cache_size = 5000)
-    
-        hyperparameter_grid = {
-            'C' : [(0), (0.25), (0.5), (0.75), (1)],
-            'kernel' : ('linear', 'poly', 'rbf', 'sigmoid'),
-            'degree' : [(1), (2), (3)]
-            }
+        svc, hyperparameter_grid = self.define_models()['svm']
         
-        self.svm = GridSearchCV(svc, hyperparameter_grid, n_jobs = -1, cv = 5)
+        self.svm = self.make_search(svc, hyperparameter_grid)
         
         self.svm.fit(self.X_train, self.y_train)
+        self.calibrate_svm()
      
-        print('Best parameters found:\n', self.svm.best_params_)
-        
-        for mean, std, params in zip(self.svm.cv_results_['mean_test_score'],
-                                     self.svm.cv_results_['std_test_score'],
-                                     self.svm.cv_results_['params']):
-            print("%0.3f (+/-%0.03f) for %r" % (mean, std * 2, params))   
+        self.print_search(self.svm, best_params = True)
                 
         return self.svm
 
 
-    def model_bagging(self):
+    def calibrate_svm(self):
+        ''' The function adds probabilities to the best SVM of the search, in
+            one step after the search instead of in every candidate fit. The
+            sigmoid is fitted on 5-fold decision values and the SVM is then
+            refitted on the whole sample, as SVC(probability = True) does.
+            '''
         
-        hyperparameter_grid = {
-            'n_estimators': [10, 20, 30, 50, 100, 150]
-            }
+        calibrated = CalibratedClassifierCV(clone(self.svm.best_estimator_),
+                                            method = 'sigmoid', cv = 5,
+                                            ensemble = False,
+                                            n_jobs = self.n_jobs)
+        calibrated.fit(self.X_train, self.y_train)
+        self.svm.best_estimator_ = calibrated
         
-        self.bag = GridSearchCV(BaggingClassifier(random_state = self.set_seed), 
-                                param_grid = hyperparameter_grid,
-                                cv = 5, n_jobs = -1)
-        self.bag.fit(self.X_train, self.y_train)
+        return self.svm
+
+
+    def search_ensemble(self, name):
+        ''' The function searches the grid of an ensemble. With warm_start
+            ensemble search and the exhaustive grid, one ensemble is grown per
+            fold and per value of the other hyperparameters and scored at
+            every n_estimators of the grid, with the results of the grid
+            search.
+
+            Inputs:
+                - name: 'bag', 'rf' or 'adaboost'.
+                '''
+
+        estimator, hyperparameter_grid = self.define_models()[name]
+
+        if self.ensemble_search == 'warm_start' and\
+            self.search_strategy == 'grid':
+            return WarmStartSearch(estimator, hyperparameter_grid, cv = 5,
+                                   n_jobs = self.n_jobs)\
+                .fit(self.X_train, self.y_train)
+
+        search = self.make_search(estimator, hyperparameter_grid)
+        search.fit(self.X_train, self.y_train)
+
+        return search
+
+
+    def model_bagging(self):
+        
+        self.bag = self.search_ensemble('bag')
             
-        for mean, std, params in zip(self.bag.cv_results_['mean_test_score'],
-                                     self.bag.cv_results_['std_test_score'],
-                                     self.bag.cv_results_['params']):
-            print("%0.3f (+/-%0.03f) for %r" % (mean, std * 2, params))   
+        self.print_search(self.bag)
         
         return self.bag
 
 
     def model_rf(self):
         
-        hyperparameter_grid = {
-            'bootstrap' : [True],
-            'max_depth' : [1, 2, 3, 4, 5, 10, 15],
-            'min_samples_leaf' : [10],
-            'n_estimators': [10, 20, 30, 50, 100, 150]
-            }
-    
-        self.rf = GridSearchCV(RandomForestClassifier(random_state = self.set_seed),
-                               param_grid = hyperparameter_grid, cv = 5, 
-                               n_jobs = -1)
-        self.rf.fit(self.X_train, self.y_train)
+        self.rf = self.search_ensemble('rf')
 
-        for mean, std, params in zip(self.rf.cv_results_['mean_test_score'],
-                                     self.rf.cv_results_['std_test_score'],
-                                     self.rf.cv_results_['params']):
-            print("%0.3f (+/-%0.03f) for %r" % (mean, std * 2, params))   
+        self.print_search(self.rf)
 
         return self.rf
 
     
     def model_adaboost(self):
         
-        hyperparameter_grid = {
-            'n_estimators': [10, 20, 30, 50, 100, 150]
-            }
-        
-        self.adaboost = GridSearchCV(AdaBoostClassifier(random_state = self.set_seed),
-                                     param_grid = hyperparameter_grid, cv = 5,
-                                     n_jobs = -1)
-        self.adaboost.fit(self.X_train, self.y_train)
+        self.adaboost = self.search_ensemble('adaboost')
 
-        for mean, std, params in zip(self.adaboost.cv_results_['mean_test_score'],
-                                     self.adaboost.cv_results_['std_test_score'],
-                                     self.adaboost.cv_results_['params']):
-            print("%0.3f (+/-%0.03f) for %r" % (mean, std * 2, params))           
+        self.print_search(self.adaboost)
         
         return self.adaboost
 
 
-    def run(self, selection_metric, select_features_bool, encoding_metric):
+    def schedule_models(self):
+        ''' The function fits all model families at once. The candidate fits
+            of all grid searches share one pool of n_jobs processes, the
+            longest first, and every family is refitted as soon as its own
+            search is done. Warm-started ensembles are searched after the
+            pool.
+            '''
+        
+        warm_started = ['bag', 'rf', 'adaboost']\
+            if self.ensemble_search == 'warm_start' else []
+
+        scheduler = Scheduler(n_jobs = self.n_jobs, cv = 5)
+        for name, (estimator, hyperparameter_grid) in\
+            self.define_models().items():
+            if name not in warm_started:
+                scheduler.add(name, estimator, hyperparameter_grid)
+        
+        results = scheduler.run(self.X_train, self.y_train)
+        for name in warm_started:
+            results[name] = self.search_ensemble(name)
+        
+        (self.logit, self.ann, self.knn, self.svm,
+         self.bag, self.rf, self.adaboost) = (
+             results['logit'], results['ann'], results['knn'],
+             results['svm'], results['bag'], results['rf'],
+             results['adaboost'])
+        self.calibrate_svm()
+        
+        for name in ['ann', 'knn', 'svm']:
+            self.print_search(results[name], best_params = True)
+        for name in ['bag', 'rf', 'adaboost']:
+            self.print_search(results[name])
+        
+        return results
+
+
+    def run(self, selection_metric, select_features_bool, encoding_metric,
+            schedule = False):
+        
+        # The scheduler fits the exhaustive grids of define_models only, it
+        #  has no halving, random or neighbour index search.
+        if schedule and self.search_strategy != 'grid':
+            raise ValueError('The scheduler runs the grid search strategy '
+                             f'only, not {self.search_strategy}.')
+        if schedule and self.knn_index is not None:
+            raise ValueError('The scheduler searches the KNN without a '
+                             f'neighbour index, not {self.knn_index}.')
         
         self.select_features(selection_metric, select_features_bool)
         self.apply_one_hot(encoding_metric)
-        self.model_logit()
-        self.model_ann()
-        self.model_knn()
-        self.model_svm()
-        self.model_bagging()
-        self.model_rf()
-        self.model_adaboost()
+        if schedule:
+            self.schedule_models()
+        else:
+            self.model_logit()
+            self.model_ann()
+            self.model_knn()
+            self.model_svm()
+            self.model_bagging()
+            self.model_rf()
+            self.model_adaboost()
         
         return (self.logit, self.ann, self.knn,  self.svm,
                 self.bag, self.rf, self.adaboost,
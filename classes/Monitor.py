@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import os
+from glob import glob
+
+import numpy as np
+import pandas as pd
+from scipy.special import logit
+
+from Metrics import compute_metrics
+from ModelRegistry import ModelRegistry
+from ScoringService import load_service
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+# Name of the score in the bin counts, next to the WoE variables.
+SCORE_VARIABLE = 'score'
+
+# Columns of the bin counts, a file per model and month.
+COUNT_COLUMNS = ['model', 'month', 'variable', 'bin', 'count', 'defaults']
+
+
+def population_stability_index(expected, actual, floor = 1e-4):
+    ''' The function computes the PSI of two distributions over the same
+        bins from their counts. Empty bins get a small floor share, so that
+        the index stays finite.
+        '''
+
+    expected = np.maximum(expected / max(expected.sum(), 1), floor)
+    actual = np.maximum(actual / max(actual.sum(), 1), floor)
+
+    return ((actual - expected) * np.log(actual / expected)).sum()
+
+
+def bucket_scores(scores, n_buckets, logit_range):
+    ''' The function maps the scores to fine buckets of equal width on the
+        logit scale. The low PDs of a portfolio with few defaults spread
+        over many buckets, as the higher ones. Scores out of the range fall
+        into the first or the last bucket.
+
+        Inputs:
+            - scores: scores of the loans, ie. PDs,
+            - n_buckets: number of buckets,
+            - logit_range: lowest and highest logit of the buckets.
+            '''
+
+    low, high = logit_range
+    with np.errstate(divide = 'ignore'):
+        z = logit(np.asarray(scores, dtype = 'float64'))
+
+    return np.clip(np.floor((z - low) / (high - low) * n_buckets),
+                   0, n_buckets - 1).astype(int)
+
+
+def merge_buckets(counts, n_groups):
+    ''' The function merges the fine buckets of the score into n_groups
+        groups of about equal shares of the reference counts, eg. deciles.
+        '''
+
+    shares = counts.cumsum() / max(counts.sum(), 1)
+
+    return np.minimum((shares - counts / max(counts.sum(), 1)) * n_groups,
+                      n_groups - 1).astype(int)
+
+
+class Monitor():
+
+
+    def __init__(self, registry_dir, monitor_dir,
+                 target = 'default_event_flg', month_variable = 'obs_yyyymm',
+                 families = None, n_buckets = 200, logit_range = (-10, 10)):
+        self.registry: ModelRegistry = ModelRegistry(registry_dir)
+        self.monitor_dir: str = monitor_dir
+        self.target: str = target
+        self.month_variable: str = month_variable # format yyyymm.
+        self.n_buckets: int = n_buckets # fine buckets of the score.
+        self.logit_range: tuple = logit_range # logits of the buckets.
+
+        os.makedirs(self.monitor_dir, exist_ok = True)
+
+        # Registered models with a scoring bundle, from the manifests only.
+        self.models = {manifest['name'] : (manifest['scenario_id'],
+                                           manifest['family'],
+                                           manifest.get('prefix', ''))
+                       for manifest in self.registry.manifests()
+                       if 'bundle' in manifest['files'] and
+                       (families is None or manifest['family'] in families)}
+
+
+    def results_path(self):
+
+        return os.path.join(self.monitor_dir, 'results.csv')
+
+
+    def counts_path(self, model, month):
+
+        return os.path.join(self.monitor_dir, 'bin_counts', model,
+                            f'{month}.csv')
+
+
+    def read_results(self):
+
+        path = self.results_path()
+
+        return pd.read_csv(path) if os.path.exists(path) else pd.DataFrame()
+
+
+    def read_counts(self, months = None):
+        ''' The function reads the bin counts of all models, of the given
+            months only or of all months.
+            '''
+
+        paths = sorted(glob(self.counts_path('*', '*')))
+        if months is not None:
+            months = {str(i) for i in months}
+            paths = [i for i in paths
+                     if os.path.splitext(os.path.basename(i))[0] in months]
+
+        if len(paths) == 0:
+            return pd.DataFrame(columns = COUNT_COLUMNS)
+
+        return pd.concat([pd.read_csv(i) for i in paths], ignore_index = True)
+
+
+    def write_counts(self, model, month, df):
+
+        path = self.counts_path(model, month)
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        df.to_csv(path + '.tmp', index = False)
+        os.replace(path + '.tmp', path)
+
+
+    def write_results(self, results, new_results):
+        ''' The function appends the results of the newly scored months. The
+            file is rewritten only when rows of rescored months are
+            replaced, eg. of immature targets or of an interrupted update.
+            '''
+
+        path = self.results_path()
+        scored = pd.MultiIndex.from_frame(new_results[['model', 'month']])
+        replaced = pd.MultiIndex.from_frame(results[['model', 'month']])\
+            .isin(scored) if len(results) else np.zeros(0, dtype = bool)
+
+        if replaced.any():
+            pd.concat([results.loc[~replaced], new_results])\
+                .to_csv(path + '.tmp', index = False)
+            os.replace(path + '.tmp', path)
+        else:
+            new_results.to_csv(path, mode = 'a', index = False,
+                               header = not os.path.exists(path))
+
+
+    def done_months(self, results, model = None):
+
+        if len(results) == 0:
+            return pd.Series(dtype = 'int64')
+
+        # Months of immature targets are scored again on the next update.
+        results = results.loc[results['n_observed'] == results['n']]
+        if model is not None:
+            results = results.loc[results['model'] == model]
+
+        return results.groupby('month')['model'].nunique()
+
+
+    def new_months(self, months):
+        ''' The function lists the months which some monitored model has not
+            scored yet, or not with all its targets observed, eg. to read the
+            partitions of these months only.
+
+            Inputs:
+                - months: months of the available data.
+                '''
+
+        done = self.done_months(self.read_results())
+
+        return sorted(i for i in set(months)
+                      if done.get(i, 0) < len(self.models))
+
+
+    def count_bins(self, name, service, month, bins, y, scores):
+        ''' The function counts the loans and the defaults per bin of every
+            WoE variable and per fine bucket of the score in one month.
+            '''
+
+        variables = list(service.features) + [SCORE_VARIABLE]
+        buckets = bucket_scores(scores, self.n_buckets, self.logit_range)
+        columns = [bins[:, i] for i in range(bins.shape[1])] + [buckets]
+        sizes = [len(i) for i in service.values] + [self.n_buckets]
+
+        counts = []
+        for variable, column, size in zip(variables, columns, sizes):
+            counts.append(pd.DataFrame({
+                'model' : name,
+                'month' : month,
+                'variable' : variable,
+                'bin' : np.arange(size),
+                'count' : np.bincount(column, minlength = size),
+                'defaults' : np.bincount(column, weights = y,
+                                         minlength = size).astype(int)}))
+
+        return pd.concat(counts)
+
+
+    def update(self, df):
+        ''' The function scores the months of a frame which are not in the
+            results yet with the stored models and binning. Per model and
+            month it writes the counts per bin to a file of their own and
+            appends the AUC, Gini and KS to the results, so that a month
+            costs a pass over its own rows and no rewrite of the stored
+            months. A month whose targets are not all observed yet gets its
+            counts but no metrics, and it is scored again on the next
+            update.
+
+            Inputs:
+                - df: output of the DataGetter with the target and the
+                  month, eg. of the newly arrived months only.
+                '''
+
+        results = self.read_results()
+        new_results = []
+
+        for name, (scenario_id, family, prefix) in self.models.items():
+            done = set(self.done_months(results, name).index)
+            helper = df.loc[~df[self.month_variable].isin(done)]
+            if len(helper) == 0:
+                continue
+
+            service = load_service(self.registry.bundle_path(scenario_id,
+                                                             family, prefix))
+            bins, scores = service.score_frame(helper)
+            observed = helper[self.target].notnull().to_numpy()
+            y = helper[self.target].fillna(0).to_numpy(dtype = 'int64')
+            months = helper[self.month_variable].to_numpy()
+
+            for month in np.unique(months):
+                mask = months == month
+                row = {'model' : name, 'scenario_id' : scenario_id,
+                       'family' : family, 'month' : month,
+                       'n' : int(mask.sum()),
+                       'n_observed' : int(observed[mask].sum()),
+                       'positives' : int(y[mask].sum()),
+                       'auc' : np.nan, 'gini' : np.nan, 'ks' : np.nan}
+                # The metrics need all targets, and both defaults and
+                #  non-defaults.
+                if row['n_observed'] == row['n'] and\
+                    0 < row['positives'] < row['n']:
+                    metrics = compute_metrics(y[mask], scores[mask])
+                    row.update({key : metrics[key]
+                                for key in ['auc', 'gini', 'ks']})
+                new_results.append(row)
+                # The counts of a rescored month replace its file.
+                self.write_counts(name, month,
+                                  self.count_bins(name, service, month,
+                                                  bins[mask], y[mask],
+                                                  scores[mask]))
+
+        if len(new_results) == 0:
+            return pd.DataFrame()
+
+        # The results come last, a month without them is scored again.
+        new_results = pd.DataFrame(new_results)
+        self.write_results(results, new_results)
+
+        return new_results
+
+
+    def population_stability(self, reference_months, months = None,
+                             n_groups = 10):
+        ''' The function computes the CSI of every WoE variable and the PSI of
+            the score per model and month against reference months, from the
+            cached bin counts only. The fine buckets of the score are merged
+            into n_groups groups of equal reference shares.
+
+            Inputs:
+                - reference_months: months of the reference distribution, eg.
+                  the development sample,
+                - months: compared months, by default all the others,
+                - n_groups: groups of the score, eg. deciles.
+                '''
+
+        counts = self.read_counts(None if months is None else
+                                  list(reference_months) + list(months))
+        reference = counts.loc[counts['month'].isin(reference_months)]\
+            .groupby(['model', 'variable', 'bin'])['count'].sum()
+        if months is None:
+            months = sorted(set(counts['month']) - set(reference_months))
+        counts = counts.loc[counts['month'].isin(months)]
+
+        table = []
+        for (model, variable), helper in reference.groupby(level = [0, 1]):
+            expected = helper.to_numpy()
+            groups = merge_buckets(expected, n_groups)\
+                if variable == SCORE_VARIABLE else np.arange(len(expected))
+            expected = np.bincount(groups, weights = expected)
+
+            monthly = counts.loc[(counts['model'] == model) &
+                                 (counts['variable'] == variable)]
+            for month, actual in monthly.groupby('month'):
+                actual = actual.sort_values('bin')['count'].to_numpy()
+                table.append({'model' : model, 'month' : month,
+                              'variable' : variable,
+                              'index' : 'psi' if variable == SCORE_VARIABLE
+                              else 'csi',
+                              'value' : population_stability_index(
+                                  expected, np.bincount(groups,
+                                                        weights = actual))})
+
+        self.stability = pd.DataFrame(table, columns = ['model', 'month',
+                                                      'variable', 'index',
+                                                      'value'])
+
+        return self.stability
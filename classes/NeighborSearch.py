@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils import _safe_indexing
+
+from Scheduler import SearchResult, cv_results
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+class ExactIndex():
+
+
+    def __init__(self, p):
+        self.p: int = p # 1 manhattan, 2 euclidean distance.
+
+
+    def fit(self, X):
+
+        self.neighbors = NearestNeighbors(p = self.p).fit(X)
+
+        return self
+
+
+    def kneighbors(self, X, n_neighbors):
+
+        return self.neighbors.kneighbors(X, n_neighbors = n_neighbors)
+
+
+class NNDescentIndex():
+    ''' Approximate index of pynndescent, for large portfolios. The package
+        is an optional dependency, it is imported only when the index is
+        used.
+        '''
+
+
+    def __init__(self, p, random_state = None):
+        self.p: int = p
+        self.random_state: int = random_state
+
+
+    def fit(self, X):
+
+        from pynndescent import NNDescent
+
+        self.neighbors = NNDescent(X, metric = 'manhattan' if self.p == 1
+                                   else 'euclidean',
+                                   random_state = self.random_state)
+        self.neighbors.prepare()
+
+        return self
+
+
+    def kneighbors(self, X, n_neighbors):
+
+        indices, distances = self.neighbors.query(X, k = n_neighbors)
+
+        return distances, indices
+
+
+# Neighbour indices by name, any class with fit and kneighbors can be used.
+INDEXES = {'exact' : ExactIndex, 'nndescent' : NNDescentIndex}
+
+
+def make_index(index, p):
+
+    if isinstance(index, str):
+        index = INDEXES[index]
+
+    return index(p)
+
+
+def vote(distances, neighbor_classes, n_classes, n_neighbors, weights):
+    ''' The function computes the class probabilities of the first k
+        neighbours of sorted neighbour lists, for every k at once, as
+        KNeighborsClassifier.predict_proba.
+
+        Inputs:
+            - distances: sorted distances to the neighbours,
+            - neighbor_classes: class codes of the neighbours,
+            - n_classes: number of classes,
+            - n_neighbors: list of numbers of neighbours k,
+            - weights: 'uniform' or 'distance'.
+            '''
+
+    if weights == 'uniform':
+        weight = np.ones(distances.shape)
+    else:
+        with np.errstate(divide = 'ignore'):
+            weight = 1.0 / distances
+        # Neighbours at zero distance take all the weight, as in sklearn.
+        zero = distances == 0
+        weight = np.where(zero[:, :1], zero, weight)
+
+    votes = np.zeros(distances.shape + (n_classes,))
+    np.put_along_axis(votes, neighbor_classes[:, :, None], weight[:, :, None],
+                      axis = 2)
+    votes = np.cumsum(votes, axis = 1)
+
+    probabilities = {}
+    for k in n_neighbors:
+        probabilities[k] = votes[:, k - 1, :] /\
+            votes[:, k - 1, :].sum(axis = 1, keepdims = True)
+
+    return probabilities
+
+
+def score_fold(X, y_codes, train, test, candidates, index):
+    ''' The function scores all candidates on one fold. The index is built
+        once per distance and queried once for the largest k, the smaller k
+        and both weights are read from the same neighbour lists.
+        '''
+
+    n_classes = y_codes.max() + 1
+    scores = np.full(len(candidates), np.nan)
+    fit_times = np.zeros(len(candidates))
+    score_times = np.zeros(len(candidates))
+
+    for p in sorted({i['p'] for i in candidates}):
+        members = [i for i, params in enumerate(candidates)
+                   if params['p'] == p]
+        k_max = max(candidates[i]['n_neighbors'] for i in members)
+
+        start = time.perf_counter()
+        neighbors = make_index(index, p).fit(_safe_indexing(X, train))
+        fit_times[members] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        distances, indices = neighbors.kneighbors(_safe_indexing(X, test),
+                                                  k_max)
+        neighbor_classes = y_codes[train][indices]
+
+        for weights in {candidates[i]['weights'] for i in members}:
+            group = [i for i in members
+                     if candidates[i]['weights'] == weights]
+            probabilities = vote(distances, neighbor_classes, n_classes,
+                                 [candidates[i]['n_neighbors'] for i in group],
+                                 weights)
+            for i in group:
+                predictions = probabilities[candidates[i]['n_neighbors']]\
+                    .argmax(axis = 1)
+                scores[i] = np.mean(predictions == y_codes[test])
+        score_times[members] = time.perf_counter() - start
+
+    return scores, fit_times, score_times
+
+
+class IndexedKNeighborsClassifier():
+
+
+    def __init__(self, n_neighbors = 5, weights = 'uniform', p = 2,
+                 index = 'exact', batch_size = 10000):
+        self.n_neighbors: int = n_neighbors
+        self.weights: str = weights
+        self.p: int = p
+        self.index = index # name in INDEXES or an index class.
+        self.batch_size: int = batch_size # rows queried at once.
+
+
+    def fit(self, X, y):
+
+        self.classes_, self.y_codes = np.unique(np.asarray(y),
+                                                return_inverse = True)
+        self.index_ = make_index(self.index, self.p).fit(X)
+
+        return self
+
+
+    def predict_proba(self, X):
+
+        probabilities = []
+
+        for i in range(0, X.shape[0], self.batch_size):
+            distances, indices = self.index_.kneighbors(
+                X[i:i + self.batch_size], self.n_neighbors)
+            probabilities.append(vote(distances, self.y_codes[indices],
+                                      len(self.classes_), [self.n_neighbors],
+                                      self.weights)[self.n_neighbors])
+
+        return np.concatenate(probabilities)
+
+
+    def predict(self, X):
+
+        return self.classes_[self.predict_proba(X).argmax(axis = 1)]
+
+
+    def score(self, X, y):
+
+        return np.mean(self.predict(X) == np.asarray(y))
+
+
+class KNNSearch():
+
+
+    def __init__(self, param_grid, cv = 5, index = 'exact', n_jobs = -1):
+        self.param_grid: dict = param_grid # grid of n_neighbors, weights, p.
+        self.cv: int = cv
+        self.index = index
+        self.n_jobs: int = n_jobs
+
+
+    def fit(self, X, y):
+        ''' The function searches the grid of the KNN with one neighbour query
+            per fold and distance instead of one per candidate, scored by
+            accuracy as GridSearchCV. The best candidate is refitted on the
+            whole sample.
+
+            Inputs:
+                - X: training features,
+                - y: training target.
+                '''
+
+        candidates = list(ParameterGrid(self.param_grid))
+        classes, y_codes = np.unique(np.asarray(y), return_inverse = True)
+        folds = StratifiedKFold(self.cv).split(np.zeros(len(y_codes)),
+                                               y_codes)
+
+        results = Parallel(n_jobs = self.n_jobs)(
+            delayed(score_fold)(X, y_codes, train, test, candidates,
+                                self.index)
+            for train, test in folds)
+        scores, fit_times, score_times = [np.column_stack(i)
+                                          for i in zip(*results)]
+
+        results = cv_results(candidates, scores, fit_times, score_times)
+        best_params = candidates[int(np.argmin(results['rank_test_score']))]
+
+        start = time.perf_counter()
+        best_estimator = IndexedKNeighborsClassifier(index = self.index,
+                                                     **best_params).fit(X, y)
+
+        self.search = SearchResult(IndexedKNeighborsClassifier(
+                                       index = self.index),
+                                   self.param_grid, results, best_estimator,
+                                   time.perf_counter() - start)
+
+        return self.search
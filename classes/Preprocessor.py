@@ -12,6 +12,10 @@ import numpy as np
 from imblearn.under_sampling import RandomUnderSampler
 from sklearn.model_selection import train_test_split
 from optbinning import BinningProcess
+from joblib import parallel_config
+
+from WoETransformer import WoETransformer
+from Decorrelator import Decorrelator
 from collinearity import SelectNonCollinear
 from sklearn.feature_selection import f_classif
 
@@ -24,7 +28,8 @@ class Preprocessor():
 
     
     def __init__(self, set_seed, target, df, undersample, 
-                 decorrelate, oot_year, encoding_metric):
+                 decorrelate, oot_year, encoding_metric, n_jobs = None,
+                 decorrelation_engine = 'decorrelator'):
         self.set_seed: int = set_seed
         self.target: str = target
         self.df: pd.DataFrame = df
@@ -32,6 +37,8 @@ class Preprocessor():
         self.decorrelate: bool = decorrelate
         self.oot_year: int = oot_year # format yyyymm.
         self.encoding_metric: str = encoding_metric
+        self.n_jobs: int = n_jobs # processes of the binning, None is serial.
+        self.decorrelation_engine: str = decorrelation_engine # or 'collinearity'.
     
     
     def retain_oot(self):
@@ -74,6 +81,10 @@ class Preprocessor():
                                      sampling_strategy = 0.25)
         
             X_train, y_train = rus.fit_resample(X_train, y_train)
+            # The resampled rows get a new index, the original one keeps
+            #  the row ids of the loans.
+            X_train.index = y_train.index =\
+                self.df_train.index[rus.sample_indices_]
             y_train = pd.DataFrame(y_train)
             self.df_train = y_train.join(X_train, how = 'left')
             
@@ -94,6 +105,25 @@ class Preprocessor():
         return self.cat_vars
     
     
+    def assemble_sample(self, df):
+        ''' The function writes the target and the WoE values of the selected
+            variables into one preallocated float32 block, column by column.
+            The returned frame wraps the block without a copy.
+            
+            Inputs:
+                - df: sample with the target and the raw variables.
+                '''
+        
+        names = list(self.woe_transformer.tables)
+        block = np.empty((len(df), len(names) + 1), dtype = 'float32',
+                         order = 'F')
+        block[:, 0] = df[self.target].to_numpy()
+        self.woe_transformer.transform_array(df, out = block[:, 1:])
+        
+        return pd.DataFrame(block, columns = [self.target] + names,
+                            copy = False)
+    
+    
     def bin_and_transform(self):
 
         # X and y.
@@ -107,37 +137,36 @@ class Preprocessor():
             'iv' : {'min' : 0.05},
             'gini' : {'min' : 0.1}
             }
+        # optbinning infers the categorical type only for string columns.
+        categorical_variables = list(self.cat_vars) +\
+            list(X.select_dtypes(include = 'category'))
         self.binning_process = BinningProcess(variable_names = var_names,
-                                              categorical_variables = list(self.cat_vars),
+                                              categorical_variables = categorical_variables,
                                               selection_criteria = selection_criteria,
-                                              min_n_bins = 2, max_n_bins = 10)
-        self.binning_process.fit(X, y)
+                                              min_n_bins = 2, max_n_bins = 10,
+                                              n_jobs = self.n_jobs)
+        
+        # The binning process splits the variables into n_jobs shards and
+        #  merges the fitted shards before the selection criteria apply. Its
+        #  default thread backend is held by the GIL, loky fits the shards in
+        #  processes instead.
+        with parallel_config(backend = 'loky'):
+            self.binning_process.fit(X, y)
         #binning_process.information()
         self.performance_summary = self.binning_process.summary()
+        
+        # Lookup tables of the fitted binning, for scoring without optbinning.
+        self.woe_transformer = WoETransformer()
+        self.woe_transformer.compile(self.binning_process)
 
-        # Apply to train.
-        X_binned = self.binning_process.transform(X, metric='woe')
-        y = pd.DataFrame(y).reset_index()
-        self.df_train = y.join(X_binned, how = 'left')
-        self.df_train = self.df_train.drop(['index'], axis = 1)
-        
-        # Apply to test.
-        X_test = self.df_test[var_names]
-        y_test = self.df_test[self.target]
-        y_test = pd.DataFrame(y_test).reset_index()
-        X_test_binned = self.binning_process.transform(X_test, 
-                                                       metric='woe')
-        self.df_test = y_test.join(X_test_binned, how = 'left')
-        self.df_test = self.df_test.drop(['index'], axis = 1)
-        
-        # Apply to oot.
-        X_oot = self.df_oot[var_names]
-        y_oot = self.df_oot[self.target]
-        y_oot = pd.DataFrame(y_oot).reset_index()
-        X_oot_binned = self.binning_process.transform(X_oot,
-                                                      metric='woe')
-        self.df_oot = y_oot.join(X_oot_binned, how = 'left')
-        self.df_oot = self.df_oot.drop(['index'], axis = 1)
+        # Apply to all samples. The original index is kept aside, so that
+        #  predictions can be traced back to the loans.
+        self.row_ids = {'train' : self.df_train.index.to_numpy(),
+                        'test' : self.df_test.index.to_numpy(),
+                        'oot' : self.df_oot.index.to_numpy()}
+        self.df_train = self.assemble_sample(self.df_train)
+        self.df_test = self.assemble_sample(self.df_test)
+        self.df_oot = self.assemble_sample(self.df_oot)
         
         return (self.df_train, self.df_test, self.df_oot)
 
@@ -146,9 +175,14 @@ class Preprocessor():
         
         if self.decorrelate:
                     
-            # Define selector.
-            selector = SelectNonCollinear(correlation_threshold = 0.5,
-                                          scoring = f_classif)
+            # Define selector. The built-in engine computes the correlations
+            #  once and selects the same features as collinearity.
+            if self.decorrelation_engine == 'collinearity':
+                selector = SelectNonCollinear(correlation_threshold = 0.5,
+                                              scoring = f_classif)
+            else:
+                selector = Decorrelator(correlation_threshold = 0.5,
+                                        scoring = f_classif)
             
             # Prepare X and y.
             y_train = self.df_train.loc[:, self.target]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import pandas as pd
+import numpy as np
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+# Built-in value mapping, the fallback of mapping tables without a
+#  value_mapping sheet.
+MARITAL_STATUS_MAP = pd.DataFrame(
+    [['marital_status_cd', 'Svobodn²(ß)', 'single'],
+     ['marital_status_cd', 'Äenat²', 'partnered'],
+     ['marital_status_cd', 'Vdanß', 'partnered'],
+     ['marital_status_cd', 'Reg.partner', 'partnered'],
+     ['marital_status_cd', 'Rozveden²(ß)', 'divorced'],
+     ['marital_status_cd', 'Vdovec', 'widowed'],
+     ['marital_status_cd', 'Vdova', 'widowed'],
+     ['marital_status_cd', 'Nezadßno', 'other'],
+     ['marital_status_cd', 'Zem°el(a)', 'other'],
+     ['marital_status_cd', None, 'other']],
+    columns = ['variable_name', 'source_value', 'target_value'])
+
+
+class Recoder():
+
+
+    def __init__(self, value_map):
+        # Long format: variable_name, source_value, target_value. An empty
+        #  source_value holds the bucket of missing values.
+        self.value_map: pd.DataFrame = value_map
+
+
+    def build_lookup(self, name, categories):
+        ''' The function translates the mapping of one variable to a lookup
+            array over the category codes of that variable. Values without
+            a mapping keep their own category.
+
+            Inputs:
+                - name: name of the recoded variable,
+                - categories: categories observed in the data.
+                '''
+
+        helper = self.value_map.loc[self.value_map['variable_name'] == name]
+        missing = helper.loc[helper['source_value'].isnull(), 'target_value']
+        helper = helper.loc[helper['source_value'].notnull()]
+        mapping = dict(zip(helper['source_value'], helper['target_value']))
+
+        # Buckets come first and in the order of the mapping table, so that
+        #  every chunk of a dataset gets the same categories.
+        targets = list(dict.fromkeys(self.value_map.loc[
+            self.value_map['variable_name'] == name, 'target_value']))
+        targets = pd.Index(targets + [i for i in categories
+                                      if i not in mapping
+                                      and i not in targets])
+
+        # The last element is the target of code -1, ie. of missing values.
+        lookup = targets.get_indexer([mapping.get(i, i) for i in categories])
+        lookup = np.append(lookup,
+                           targets.get_loc(missing.iloc[0])
+                           if len(missing) > 0 else -1)
+
+        return lookup, targets
+
+
+    def recode(self, df, variable_names = None):
+        ''' The function recodes the variables of the mapping table in one
+            pass per variable. The values are factorized once and the codes
+            are remapped through a lookup array, the result is categorical.
+
+            Inputs:
+                - df: master dataset,
+                - variable_names: subset of the mapped variables to recode.
+                '''
+
+        if variable_names is None:
+            variable_names = list(dict.fromkeys(self.value_map['variable_name']))
+
+        for name in variable_names:
+            if name not in df.columns:
+                continue
+
+            values = pd.Categorical(df[name])
+            lookup, targets = self.build_lookup(name, list(values.categories))
+            df[name] = pd.Categorical.from_codes(lookup[values.codes],
+                                                 categories = targets)
+
+        return df
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_pdf import PdfPages
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+SAMPLES = [('train', ':'), ('test', '-'), ('oot', '--')]
+
+
+def draw_roc(ax, curves):
+
+    for sample, style in SAMPLES:
+        ax.plot(curves[sample]['fpr'], curves[sample]['tpr'], style,
+                label = f"({sample} set, AUC = {curves[sample]['auc']:.2f})",
+                color = 'k')
+    ax.plot([0, 1], [0, 1], color = 'k')
+
+    # Labels.
+    ax.set_xlabel('FPR')
+    ax.set_ylabel('TPR')
+    for pos in ['right', 'top']:
+        ax.spines[pos].set_visible(False)
+    ax.legend()
+
+
+def draw_cap(ax, curves):
+
+    # Random model.
+    ax.plot([0, 1], [0, 1], '--', color = 'k')
+
+    for sample, style in SAMPLES:
+        ax.plot(curves[sample]['cap_x'], curves[sample]['cap_y'], style,
+                color = 'k',
+                label = "{} set, Gini: {:.5f}".format(
+                    sample, curves[sample]['gini']))
+
+    # Perfect model plot.
+    N, positives = curves['oot']['n'], curves['oot']['positives']
+    ax.plot([0, positives / N, 1], [0, 1, 1], color = 'k',
+            label = "Perfect model")
+
+    # Labels.
+    ax.set_xlabel('Fraction of all population')
+    ax.set_ylabel('Fraction of event population')
+    for pos in ['right', 'top']:
+        ax.spines[pos].set_visible(False)
+    ax.legend(loc = 'lower right')
+
+
+def draw_ks(ax, curves):
+
+    # Shares of defaults and non-defaults scored at least the threshold.
+    for sample, style in SAMPLES:
+        thresholds = curves[sample]['thresholds'][1:]
+        ax.plot(thresholds, curves[sample]['tpr'][1:], style, color = 'k',
+                label = f"{sample} set defaults")
+        ax.plot(thresholds, curves[sample]['fpr'][1:], style, color = 'k',
+                label = f"{sample} set non-defaults")
+
+    # KS of the oot set, a model with no separating threshold has none.
+    oot = curves['oot']
+    if oot['ks'] > 0 and np.isfinite(oot['ks_threshold']):
+        ks_fpr, ks_tpr = oot['ks_fpr'], oot['ks_tpr']
+        ax.vlines(oot['ks_threshold'], ymin = ks_fpr, ymax = ks_tpr,
+                  color = 'k')
+
+        pos_x = oot['ks_threshold'] + 0.02
+        pos_y = 0.5 * (ks_fpr + ks_tpr)
+        text = "KS: {:.2%} at {:.2f}".format(oot['ks'], oot['ks_threshold'])
+        ax.text(pos_x, pos_y, text, fontsize = 12, rotation_mode = "anchor")
+    for pos in ['right', 'top']:
+        ax.spines[pos].set_visible(False)
+    ax.legend(loc = 'lower right')
+
+
+def thin_curves(curves, max_points):
+    ''' The function keeps at most max_points points of every curve, evenly
+        spread along it, so that a figure of a large sample stays small. The
+        metrics are kept as computed on all points.
+
+        Inputs:
+            - curves: output of Metrics.compute_metrics,
+            - max_points: points kept per curve.
+            '''
+
+    ks_id = curves['ks_id']
+    curves = {**curves, 'ks_fpr' : curves['fpr'][ks_id],
+              'ks_tpr' : curves['tpr'][ks_id]}
+
+    n_points = len(curves['fpr'])
+    if n_points > max_points:
+        keep = np.unique(np.linspace(0, n_points - 1, max_points)
+                         .round().astype(int))
+        for key in ['thresholds', 'fpr', 'tpr', 'cap_x', 'cap_y']:
+            curves[key] = curves[key][keep]
+
+    return curves
+
+
+def render_model(name, curves, path, dpi):
+    ''' The function draws the ROC, CAP and KS panels of one model on a
+        figure which is not registered in pyplot, so nothing is kept once it
+        is saved. The PNG is rendered by Agg, the figure is returned for the
+        PDF.
+
+        Inputs:
+            - name: name of the model,
+            - curves: thinned curves of the model per sample,
+            - path: path of the PNG,
+            - dpi: resolution of the PNG.
+            '''
+
+    figure = Figure(figsize = (15, 5))
+    axes = figure.subplots(1, 3)
+    draw_roc(axes[0], curves)
+    draw_cap(axes[1], curves)
+    draw_ks(axes[2], curves)
+    figure.suptitle(name)
+    figure.tight_layout()
+    figure.savefig(path, dpi = dpi)
+
+    return figure
+
+
+class Reporter():
+
+
+    def __init__(self, report_dir, n_jobs = 1, max_points = 2000, dpi = 100):
+        self.report_dir: str = report_dir
+        self.n_jobs: int = n_jobs # rendering processes.
+        self.max_points: int = max_points # points drawn per curve.
+        self.dpi: int = dpi
+
+        os.makedirs(self.report_dir, exist_ok = True)
+
+
+    def run(self, curves, metrics, model_names = None, prefix = ''):
+        ''' The function writes the report of measured models with no
+            display: a PNG of the ROC, CAP and KS panels per model rendered
+            in a pool of processes, one PDF with a page per model and the
+            table of metrics.
+
+            Inputs:
+                - curves: curves per model and sample, as Validator.curves,
+                - metrics: table of metrics, as Validator.metrics,
+                - model_names: names of the models, by default their indices,
+                - prefix: prefix of the file names, eg. a scenario.
+                '''
+
+        models = list(dict.fromkeys(model for model, sample in curves))
+        model_names = model_names or [str(i) for i in models]
+
+        tasks = [(name, {sample : thin_curves(curves[model, sample],
+                                              self.max_points)
+                         for sample, style in SAMPLES},
+                  os.path.join(self.report_dir, f'{prefix}{name}.png'),
+                  self.dpi)
+                 for model, name in zip(models, model_names)]
+
+        metrics = metrics.copy()
+        metrics['model'] = metrics['model'].map(dict(zip(models,
+                                                         model_names)))
+        metrics.to_csv(os.path.join(self.report_dir, f'{prefix}metrics.csv'),
+                       index = False)
+
+        # The pages come in the order of the models, each figure is dropped
+        #  once written.
+        pdf_path = os.path.join(self.report_dir, f'{prefix}report.pdf')
+        with PdfPages(pdf_path) as pdf:
+            if self.n_jobs == 1:
+                for figure in map(render_model, *zip(*tasks)):
+                    pdf.savefig(figure)
+            else:
+                with ProcessPoolExecutor(max_workers = self.n_jobs)\
+                    as executor:
+                    for figure in executor.map(render_model, *zip(*tasks)):
+                        pdf.savefig(figure)
+
+        return metrics
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import os
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from joblib import parallel_config
+from joblib.externals.loky import get_reusable_executor
+from threadpoolctl import threadpool_limits
+
+from Preprocessor import Preprocessor
+from Modeler import Modeler
+from Validator import Validator
+from ModelRegistry import ModelRegistry
+from ScoringService import bundle_from_modeler
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+# Arguments of run() which define a scenario, in the order of the grid.
+SCENARIO_KEYS = ['set_seed', 'undersample', 'decorrelate', 'oot_year',
+                 'encoding_metric', 'select_features_bool']
+
+# Scenarios which agree on these share the output of the Preprocessor.
+PREPROCESSING_KEYS = ['set_seed', 'undersample', 'decorrelate', 'oot_year',
+                      'encoding_metric']
+
+MODEL_NAMES = ['logit', 'ann', 'knn', 'svm', 'bag', 'rf', 'adaboost']
+
+# Output of the DataGetter and the core budget of one worker process. It is
+#  sent once per worker instead of once per scenario.
+worker_state = {}
+
+
+def init_worker(df, n_jobs):
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+    worker_state['df'] = df
+    worker_state['n_jobs'] = n_jobs
+
+
+def run_group(preprocessing, scenarios, target, selection_metric, model_dir,
+              var_map = None, value_map = None):
+    ''' The function runs all scenarios which share one preprocessing. The
+        Preprocessor runs once, the Modeler and the Validator run once per
+        scenario.
+
+        Inputs:
+            - preprocessing: arguments of the Preprocessor,
+            - scenarios: list of scenarios of the group,
+            - target: name of the target variable,
+            - selection_metric: estimator of the feature selection,
+            - model_dir: export path of the fitted models and their reports,
+            - var_map, value_map: mapping tables, to register the scoring
+              bundles of the models.
+            '''
+
+    n_jobs = worker_state['n_jobs']
+    registry = ModelRegistry(os.path.join(model_dir, 'registry'))
+    results = []
+
+    # The grid searches of a worker get its share of the cores only, and
+    #  their processes are kept from spawning extra BLAS threads.
+    with threadpool_limits(limits = n_jobs),\
+        parallel_config(backend = 'loky', inner_max_num_threads = 1):
+
+        preprocessor = Preprocessor(preprocessing['set_seed'], target,
+                                    worker_state['df'],
+                                    preprocessing['undersample'],
+                                    preprocessing['decorrelate'],
+                                    preprocessing['oot_year'],
+                                    preprocessing['encoding_metric'])
+        df_train, df_test, df_oot, performance_summary = preprocessor.run()
+
+        for scenario in scenarios:
+            scenario_id = scenario['scenario_id']
+
+            modeler = Modeler(preprocessing['set_seed'], target,
+                              preprocessing['decorrelate'], df_train,
+                              df_test, df_oot, n_jobs)
+            (logit, ann, knn, svm, bag, rf, adaboost,
+             X_train, X_test, X_oot, y_train, y_test, y_oot) =\
+                modeler.run(selection_metric,
+                            scenario['select_features_bool'],
+                            preprocessing['encoding_metric'])
+            models = [logit, ann, knn, svm, bag, rf, adaboost]
+
+            # The curves are rendered headless into the report of the
+            #  scenario, no figure is kept.
+            aucs = Validator(X_train, y_train, X_test, y_test,
+                             X_oot, y_oot, n_jobs = n_jobs)\
+                .run(models, report_dir = os.path.join(model_dir, 'reports'),
+                     model_names = MODEL_NAMES, prefix = f'{scenario_id}_')
+
+            # The registry keeps the best estimators apart from the search
+            #  results, so that they are listed and loaded fast. A rerun of
+            #  a scenario replaces its models.
+            for i, (name, model) in enumerate(zip(MODEL_NAMES, models)):
+                registry.register(model, scenario_id, name,
+                                  aucs.loc[i].to_dict(),
+                                  modeler.feature_names, overwrite = True)
+                if var_map is not None:
+                    registry.register_bundle(
+                        bundle_from_modeler(var_map, value_map, preprocessor,
+                                            modeler, model),
+                        scenario_id, name)
+
+            aucs.insert(0, 'model', MODEL_NAMES)
+            aucs.insert(0, 'scenario_id', scenario_id)
+            results.append(aucs)
+
+    # Idle processes of the grid searches would hold the worker alive.
+    get_reusable_executor().shutdown(wait = True)
+
+    return pd.concat(results)
+
+
+class ScenarioRunner():
+
+
+    def __init__(self, df, target, selection_metric, n_cores, model_dir,
+                 max_workers = None, var_map = None, value_map = None):
+        self.df: pd.DataFrame = df # output of the DataGetter.
+        self.target: str = target
+        self.selection_metric = selection_metric
+        self.n_cores: int = n_cores # total core budget.
+        self.model_dir: str = model_dir
+        self.max_workers: int = max_workers
+        self.var_map: pd.DataFrame = var_map # output of the DataGetter.
+        self.value_map: pd.DataFrame = value_map
+
+
+    def expand_grid(self, grid):
+        ''' The function lists all scenarios of a declarative grid. The
+            scenarios are numbered from 1, as the files in models/.
+
+            Inputs:
+                - grid: dictionary of lists of values per argument of run().
+                '''
+
+        values = [grid[i] for i in SCENARIO_KEYS]
+        self.scenarios = pd.DataFrame(list(itertools.product(*values)),
+                                      columns = SCENARIO_KEYS)
+        self.scenarios.insert(0, 'scenario_id',
+                              range(1, len(self.scenarios) + 1))
+
+        return self.scenarios
+
+
+    def group_scenarios(self):
+
+        self.groups = [(dict(zip(PREPROCESSING_KEYS, key)),
+                        group.to_dict('records'))
+                       for key, group in self.scenarios.groupby(
+                           PREPROCESSING_KEYS, sort = False)]
+
+        return self.groups
+
+
+    def run(self, grid):
+
+        self.expand_grid(grid)
+        self.group_scenarios()
+
+        # Split the core budget between the concurrent scenario groups.
+        n_workers = min(len(self.groups), self.max_workers or self.n_cores)
+        n_jobs = max(1, self.n_cores // n_workers)
+
+        os.makedirs(self.model_dir, exist_ok = True)
+        results = []
+
+        with ProcessPoolExecutor(max_workers = n_workers,
+                                 initializer = init_worker,
+                                 initargs = (self.df, n_jobs)) as executor:
+            futures = [executor.submit(run_group, preprocessing, scenarios,
+                                       self.target, self.selection_metric,
+                                       self.model_dir, self.var_map,
+                                       self.value_map)
+                       for preprocessing, scenarios in self.groups]
+
+            for future in as_completed(futures):
+                results.append(future.result())
+
+        self.aucs = pd.concat(results).sort_values('scenario_id',
+                                                  kind = 'stable')
+        self.aucs = self.scenarios.merge(self.aucs, on = 'scenario_id')
+
+        return self.aucs
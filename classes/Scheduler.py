@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import time
+import heapq
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+from joblib import cpu_count
+from joblib.executor import get_memmapping_executor
+from scipy.stats import rankdata
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.utils import _safe_indexing
+from threadpoolctl import threadpool_limits
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+def fit_and_score(X, y, estimator, params, train, test):
+    ''' The function fits one candidate on one fold and scores it with the
+        score method of the estimator, as GridSearchCV by default. A failed
+        fit scores NaN, as error_score of GridSearchCV.
+
+        Inputs:
+            - X, y: training data, memory-mapped by the pool,
+            - estimator: unfitted estimator,
+            - params: hyperparameters of the candidate,
+            - train, test: indices of the fold.
+            '''
+
+    model = clone(estimator).set_params(**clone(params, safe = False))
+
+    with threadpool_limits(limits = 1):
+        start = time.perf_counter()
+        try:
+            model.fit(_safe_indexing(X, train), _safe_indexing(y, train))
+            fit_time = time.perf_counter() - start
+            start = time.perf_counter()
+            score = model.score(_safe_indexing(X, test),
+                                _safe_indexing(y, test))
+        except Exception:
+            fit_time = time.perf_counter() - start
+            score = np.nan
+        score_time = time.perf_counter() - start
+
+    return score, fit_time, score_time
+
+
+def refit(X, y, estimator, params):
+
+    model = clone(estimator).set_params(**clone(params, safe = False))
+
+    with threadpool_limits(limits = 1):
+        start = time.perf_counter()
+        model.fit(X, y)
+
+    return model, time.perf_counter() - start
+
+
+def cv_results(candidates, scores, fit_times, score_times):
+    ''' The function summarises the fold scores of the candidates as
+        cv_results_ of GridSearchCV, NaN scores rank last.
+
+        Inputs:
+            - candidates: list of hyperparameters,
+            - scores, fit_times, score_times: arrays of candidates by folds.
+            '''
+
+    results = {'params' : candidates}
+
+    # Masked where a candidate of a list of grids has no such parameter.
+    for key in sorted({key for params in candidates for key in params}):
+        results[f'param_{key}'] = np.ma.MaskedArray(
+            np.empty(len(candidates), dtype = object),
+            mask = [key not in params for params in candidates])
+        for i, params in enumerate(candidates):
+            if key in params:
+                results[f'param_{key}'][i] = params[key]
+
+    for key, array in [('fit_time', fit_times), ('score_time', score_times),
+                       ('test_score', scores)]:
+        if key == 'test_score':
+            for i in range(array.shape[1]):
+                results[f'split{i}_test_score'] = array[:, i]
+        results[f'mean_{key}'] = array.mean(axis = 1)
+        results[f'std_{key}'] = array.std(axis = 1)
+
+    means = results['mean_test_score']
+    if np.isnan(means).all():
+        results['rank_test_score'] = np.ones(len(means), dtype = np.int32)
+    else:
+        means = np.nan_to_num(means, nan = np.nanmin(means) - 1)
+        results['rank_test_score'] = rankdata(-means, method = 'min')\
+            .astype(np.int32)
+
+    return results
+
+
+def estimate_cost(estimator, params):
+    ''' The function guesses the relative fit time of a candidate, so that
+        the longest fits start first: SVMs and the large networks, then the
+        ensembles by their number of estimators.
+        '''
+
+    name = type(estimator).__name__
+    params = {**estimator.get_params(), **params}
+
+    if name == 'SVC':
+        return 1000.0
+    if name == 'MLPClassifier':
+        sizes = np.atleast_1d(params['hidden_layer_sizes'])
+        return 1.0 + np.sum(sizes[:-1] * sizes[1:]) / 100 + sizes.sum() / 10
+    if 'n_estimators' in params:
+        return params['n_estimators'] * (params.get('max_depth') or 10) / 10
+
+    return 1.0
+
+
+class SearchResult():
+    ''' Fitted grid search of one model family, with the attributes of a
+        fitted GridSearchCV which are used downstream.
+        '''
+
+
+    def __init__(self, estimator, param_grid, cv_results,
+                 best_estimator, refit_time):
+        self.estimator = estimator
+        self.param_grid: dict = param_grid
+        self.cv_results_: dict = cv_results
+        self.best_index_: int = int(np.argmin(cv_results['rank_test_score']))
+        self.best_params_: dict = cv_results['params'][self.best_index_]
+        self.best_score_: float = cv_results['mean_test_score'][self.best_index_]
+        self.best_estimator_ = best_estimator
+        self.refit_time_: float = refit_time
+        self.classes_ = getattr(best_estimator, 'classes_', None)
+
+
+    def predict(self, X):
+
+        return self.best_estimator_.predict(X)
+
+
+    def predict_proba(self, X):
+
+        return self.best_estimator_.predict_proba(X)
+
+
+    def score(self, X, y):
+
+        return self.best_estimator_.score(X, y)
+
+
+class Scheduler():
+
+
+    def __init__(self, n_jobs = -1, cv = 5):
+        self.n_jobs: int = n_jobs # workers of the shared pool.
+        self.cv: int = cv
+        self.families: dict = {}
+
+
+    def add(self, name, estimator, param_grid = None):
+        ''' The function registers a model family. A family without a grid
+            is fitted once, with no cross-validation.
+
+            Inputs:
+                - name: name of the family,
+                - estimator: unfitted estimator,
+                - param_grid: hyperparameter grid as for GridSearchCV.
+                '''
+
+        candidates = list(ParameterGrid(param_grid))\
+            if param_grid is not None else []
+        self.families[name] = {'estimator' : estimator,
+                               'param_grid' : param_grid,
+                               'candidates' : candidates}
+
+        return self.families
+
+
+    def run(self, X, y):
+        ''' The function fits all candidates of all families on all folds in
+            one pool of processes. The candidates are queued by their
+            estimated cost, the longest first, and a family is refitted on
+            the whole sample as soon as its last fold is scored. The pool of
+            joblib dumps the data once to its temporary folder and the
+            workers memory-map them. The pool is shut down at the end, so
+            that joblib can remove the folder, and the next joblib pool starts
+            afresh.
+
+            Inputs:
+                - X: training features, a frame or a sparse matrix,
+                - y: training target.
+                '''
+
+        n_workers = self.n_jobs if self.n_jobs > 0 else\
+            max(1, cpu_count() + 1 + self.n_jobs)
+        folds = list(StratifiedKFold(self.cv).split(np.zeros(len(y)), y))
+
+        # Queue of (priority, order, task), refits go first.
+        queue = []
+        order = 0
+        for name, family in self.families.items():
+            if not family['candidates']:
+                heapq.heappush(queue, (-np.inf, order, ('refit', name, {})))
+                order += 1
+            for i, params in enumerate(family['candidates']):
+                cost = estimate_cost(family['estimator'], params)
+                for k, (train, test) in enumerate(folds):
+                    heapq.heappush(queue, (-cost, order,
+                                           ('fold', name, (i, k, train, test))))
+                    order += 1
+
+        scores = {name : np.full((len(family['candidates']), self.cv), np.nan)
+                  for name, family in self.families.items()}
+        fit_times = {name : np.zeros_like(scores[name]) for name in scores}
+        score_times = {name : np.zeros_like(scores[name]) for name in scores}
+        pending = {name : scores[name].size for name in scores}
+        self.results = {}
+
+        executor = get_memmapping_executor(n_workers)
+        running = {}
+
+        try:
+            while queue or running:
+                # Keep every worker busy with one task in hand.
+                while queue and len(running) < 2 * n_workers:
+                    task = heapq.heappop(queue)[2]
+                    kind, name, arguments = task
+                    family = self.families[name]
+                    if kind == 'fold':
+                        i, k, train, test = arguments
+                        future = executor.submit(fit_and_score, X, y,
+                                                 family['estimator'],
+                                                 family['candidates'][i],
+                                                 train, test)
+                    else:
+                        future = executor.submit(refit, X, y,
+                                                 family['estimator'],
+                                                 arguments)
+                    running[future] = task
+
+                done, _ = wait(running, return_when = FIRST_COMPLETED)
+
+                for future in done:
+                    kind, name, arguments = running.pop(future)
+                    family = self.families[name]
+
+                    if kind == 'refit':
+                        model, refit_time = future.result()
+                        if family['candidates']:
+                            self.results[name] = SearchResult(
+                                family['estimator'], family['param_grid'],
+                                family['cv_results'], model, refit_time)
+                        else:
+                            self.results[name] = model
+                        continue
+
+                    i, k, train, test = arguments
+                    (scores[name][i, k], fit_times[name][i, k],
+                     score_times[name][i, k]) = future.result()
+                    pending[name] -= 1
+
+                    # The last fold of a family releases its refit.
+                    if pending[name] == 0:
+                        family['cv_results'] = cv_results(
+                            family['candidates'], scores[name],
+                            fit_times[name], score_times[name])
+                        best = int(np.argmin(
+                            family['cv_results']['rank_test_score']))
+                        heapq.heappush(queue, (-np.inf, order,
+                                               ('refit', name,
+                                                family['candidates'][best])))
+                        order += 1
+        finally:
+            executor.terminate()
+
+        return self.results
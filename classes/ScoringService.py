@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import math
+import bisect
+import warnings
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.special import expit
+from joblib import dump, load
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+# Forests and bagging of trees are averaged trees, scored in pure python.
+#  AdaBoost is a weighted vote of its trees. The other families, ie. the
+#  ANN, the SVM and the KNN, are not compiled and are scored by their
+#  estimators, so that one loan takes a call of predict_proba, eg. a p99
+#  of several ms for the KNN.
+TREE_ENSEMBLES = ['RandomForestClassifier', 'ExtraTreesClassifier',
+                  'BaggingClassifier']
+
+# Message of the warning of estimators fitted on frames and scored on
+#  arrays, which carry no feature names.
+FEATURE_NAMES_WARNING = 'X does not have valid feature names'
+
+
+def make_bundle(var_map, value_map, woe_transformer, features, model,
+                one_hot_encoder = None):
+    ''' The function collects everything needed to score a raw loan with a
+        fitted model, with no rerun of the pipeline: the rename map, the
+        recoding of values, the WoE tables and the order of the features,
+        the one-hot schema and the estimator.
+
+        Inputs:
+            - var_map: mapping table of variables returned by the DataGetter,
+            - value_map: mapping table of values, eg. the marital status,
+            - woe_transformer: WoETransformer of the Preprocessor,
+            - features: WoE variables the estimator takes, in order,
+            - model: fitted search or estimator,
+            - one_hot_encoder: fitted encoder of the Modeler, if any.
+            '''
+
+    features = list(features)
+    recoding = {}
+
+    for name in dict.fromkeys(value_map['variable_name']):
+        if name not in features:
+            continue
+        helper = value_map.loc[value_map['variable_name'] == name]
+        missing = helper.loc[helper['source_value'].isnull(), 'target_value']
+        helper = helper.loc[helper['source_value'].notnull()]
+        recoding[name] = {'mapping' : dict(zip(helper['source_value'],
+                                               helper['target_value'])),
+                          'missing' : missing.iloc[0]
+                          if len(missing) > 0 else None}
+
+    return {'rename' : dict(zip(var_map['source_variable_name'],
+                                var_map['variable_name'])),
+            'recoding' : recoding,
+            'woe' : {name : woe_transformer.tables[name] for name in features},
+            'features' : features,
+            'one_hot' : [list(i) for i in one_hot_encoder.categories_]
+            if one_hot_encoder is not None else None,
+            'estimator' : getattr(model, 'best_estimator_', model)}
+
+
+def bundle_from_modeler(var_map, value_map, preprocessor, modeler, model):
+    ''' The function collects the bundle of a model fitted by a Modeler on
+        the output of a Preprocessor. With the encoding 'bins', the
+        estimator takes the one-hot columns of the WoE values.
+        '''
+
+    one_hot_encoder = getattr(modeler, 'one_hot_encoder', None)
+    features = one_hot_encoder.feature_names_in_\
+        if one_hot_encoder is not None else modeler.feature_names
+
+    return make_bundle(var_map, value_map, preprocessor.woe_transformer,
+                       features, model, one_hot_encoder)
+
+
+def is_missing(value):
+
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def logistic(z):
+
+    # Stable logistic function.
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+
+    return math.exp(z) / (1.0 + math.exp(z))
+
+
+def compile_tree(tree, features = None, weight = None):
+    ''' The function copies a fitted tree to python lists, with the
+        probability of a default per leaf. A tree of AdaBoost gets its vote
+        instead, the weight for a default and minus the weight otherwise.
+
+        Inputs:
+            - tree: fitted DecisionTreeClassifier,
+            - features: columns of the tree in the input, eg. of bagging,
+            - weight: weight of the tree in the vote of AdaBoost.
+            '''
+
+    tree = tree.tree_
+    value = tree.value[:, 0, :]
+    total = value.sum(axis = 1)
+    probabilities = value[:, 1] / np.where(total == 0, 1, total)
+    if weight is not None:
+        # The tree predicts the first class of tied leaves, as argmax.
+        probabilities = np.where(value[:, 1] > value[:, 0], weight, -weight)
+    feature = tree.feature.tolist()
+    if features is not None:
+        feature = [int(features[i]) if i >= 0 else i for i in feature]
+
+    return (tree.children_left.tolist(), tree.children_right.tolist(),
+            feature, tree.threshold.tolist(), probabilities.tolist())
+
+
+class ScoringService():
+
+
+    def __init__(self, bundle):
+        self.bundle: dict = bundle # output of make_bundle.
+        self.features: list = bundle['features']
+        self.estimator = bundle['estimator']
+
+        # The estimators score arrays. The warning is silenced once per
+        #  process, a filter around every call is not safe across the
+        #  threads of the server.
+        warnings.filterwarnings('ignore', message = FEATURE_NAMES_WARNING,
+                                category = UserWarning)
+
+        self.compile()
+
+
+    def compile(self):
+        ''' The function prepares the hot path. Every feature maps a raw
+            value to a bin, and per bin the float32 WoE the model was fitted
+            on, its one-hot column and its points of the logit. The trees are
+            copied to python lists.
+            '''
+
+        rename, one_hot = self.bundle['rename'], self.bundle['one_hot']
+        self.keys = []
+        self.binners = []
+        self.values = []
+        self.columns = []
+        offset = 0
+
+        for i, name in enumerate(self.features):
+            # Raw records use the source names, prepared ones the new names.
+            self.keys.append(tuple([source for source, target in rename.items()
+                                    if target == name and source != name]
+                                   + [name]))
+
+            table = self.bundle['woe'][name]
+            if table['dtype'] == 'numerical':
+                woe = list(table['woe']) + [table['missing']]
+                self.binners.append((True, list(table['splits']), None))
+            else:
+                woe = list(table['woe']) + [table['unknown'], table['missing']]
+                self.binners.append((False, None, {category : j for j, category
+                                                   in enumerate(
+                                                       table['categories'])}))
+
+            # The Preprocessor stores the WoE values as float32.
+            values = [float(np.float32(j)) for j in woe]
+            self.values.append(values)
+
+            if one_hot is None:
+                self.columns.append([i] * len(values))
+            else:
+                positions = {float(np.float32(j)) : k
+                             for k, j in enumerate(one_hot[i])}
+                self.columns.append([offset + positions[j] if j in positions
+                                     else -1 for j in values])
+                offset += len(one_hot[i])
+
+        self.n_columns = offset if one_hot is not None else len(self.features)
+
+        name = type(self.estimator).__name__
+        if name == 'LogisticRegression':
+            self.kind = 'logit'
+            coef = self.estimator.coef_[0].tolist()
+            self.intercept = float(self.estimator.intercept_[0])
+            if one_hot is None:
+                self.points = [[coef[i] * j for j in values]
+                               for i, values in enumerate(self.values)]
+            else:
+                self.points = [[coef[j] if j >= 0 else 0.0 for j in columns]
+                               for columns in self.columns]
+        elif name == 'DecisionTreeClassifier':
+            self.kind = 'trees'
+            self.trees = [compile_tree(self.estimator)]
+        elif name in TREE_ENSEMBLES and all(
+                type(i).__name__ == 'DecisionTreeClassifier'
+                for i in self.estimator.estimators_):
+            self.kind = 'trees'
+            features = getattr(self.estimator, 'estimators_features_',
+                               [None] * len(self.estimator.estimators_))
+            self.trees = [compile_tree(tree, columns) for tree, columns
+                          in zip(self.estimator.estimators_, features)]
+        elif name == 'AdaBoostClassifier' and\
+            getattr(self.estimator, 'algorithm', 'SAMME') == 'SAMME' and\
+            all(type(i).__name__ == 'DecisionTreeClassifier'
+                for i in self.estimator.estimators_):
+            # The binary SAMME decision is the sum of the votes over the sum
+            #  of the weights, the probability its logistic function of
+            #  twice the decision.
+            self.kind = 'boost'
+            weights = self.estimator.estimator_weights_
+            self.trees = [compile_tree(tree, weight = 2 * float(weight) /
+                                       weights.sum())
+                          for tree, weight in zip(self.estimator.estimators_,
+                                                  weights)]
+        else:
+            self.kind = 'estimator'
+
+        return self.kind
+
+
+    def bins(self, record):
+        ''' The function maps a raw record to the bin of every feature: the
+            names are translated, the values recoded and binned as by the
+            WoE tables. Missing values get the bin of the missing values.
+
+            Inputs:
+                - record: dictionary of raw values, eg. one loan.
+                '''
+
+        recoding = self.bundle['recoding']
+        bins = []
+
+        for i, name in enumerate(self.features):
+            value = None
+            for key in self.keys[i]:
+                if key in record:
+                    value = record[key]
+                    break
+
+            if name in recoding:
+                if is_missing(value):
+                    value = recoding[name]['missing']
+                else:
+                    value = recoding[name]['mapping'].get(value, value)
+
+            numerical, splits, categories = self.binners[i]
+            if is_missing(value):
+                bins.append(len(self.values[i]) - 1)
+            elif numerical:
+                bins.append(bisect.bisect_right(splits, float(value)))
+            else:
+                bins.append(categories.get(value, len(categories)))
+
+        return bins
+
+
+    def row(self, bins):
+        ''' The function builds the dense input row of the estimator. '''
+
+        if self.bundle['one_hot'] is None:
+            return [self.values[i][j] for i, j in enumerate(bins)]
+
+        row = [0.0] * self.n_columns
+        for i, j in enumerate(bins):
+            if self.columns[i][j] >= 0:
+                row[self.columns[i][j]] = 1.0
+
+        return row
+
+
+    def score_bins(self, bins):
+
+        if self.kind == 'logit':
+            z = self.intercept
+            for i, j in enumerate(bins):
+                z += self.points[i][j]
+            return logistic(z)
+
+        row = self.row(bins)
+        total = 0.0
+        for left, right, feature, threshold, probabilities in self.trees:
+            node = 0
+            while left[node] != -1:
+                node = left[node] if row[feature[node]] <= threshold[node]\
+                    else right[node]
+            total += probabilities[node]
+
+        if self.kind == 'boost':
+            return logistic(total)
+
+        return total / len(self.trees)
+
+
+    def bin_frame(self, df):
+        ''' The function maps a frame to the bins of every feature at once,
+            as the bins of single records.
+
+            Inputs:
+                - df: output of the DataGetter, ie. renamed and recoded.
+                '''
+
+        bins = np.empty((len(df), len(self.features)), dtype = 'int32')
+
+        for i, name in enumerate(self.features):
+            numerical, splits, categories = self.binners[i]
+            x = df[name]
+            if numerical:
+                bins[:, i] = np.searchsorted(
+                    splits, x.to_numpy(dtype = 'float64', na_value = np.nan),
+                    side = 'right')
+            else:
+                codes = pd.Index(list(categories)).get_indexer(x)
+                bins[:, i] = np.where(codes < 0, len(categories), codes)
+            bins[x.isnull().to_numpy(), i] = len(self.values[i]) - 1
+
+        return bins
+
+
+    def matrix(self, bins):
+        ''' The function builds the input matrix of the estimator from a
+            matrix of bins, sparse for the one-hot encoding.
+            '''
+
+        if self.bundle['one_hot'] is None:
+            return np.column_stack([np.asarray(values, dtype = 'float32')
+                                    [bins[:, i]] for i, values
+                                    in enumerate(self.values)])
+
+        columns = np.column_stack([np.asarray(j)[bins[:, i]]
+                                   for i, j in enumerate(self.columns)])
+        known = columns >= 0
+        indices = columns[known].astype('int32')
+
+        return sp.csr_matrix((np.ones(len(indices), dtype = 'float32'),
+                              indices, np.r_[0, np.cumsum(known.sum(axis = 1))]),
+                             shape = (len(bins), self.n_columns))
+
+
+    def score_matrix(self, bins):
+        ''' The function scores a matrix of bins at once, the logit from its
+            points and the other estimators by predict_proba.
+            '''
+
+        if self.kind == 'logit':
+            z = self.intercept + sum(np.asarray(points)[bins[:, i]]
+                                     for i, points in enumerate(self.points))
+            return expit(z)
+
+        return self.estimator.predict_proba(self.matrix(bins))[:, 1]
+
+
+    def score_frame(self, df):
+        ''' The function scores a frame of loans, eg. a month of new data,
+            and returns the bins of the features with the scores.
+
+            Inputs:
+                - df: output of the DataGetter.
+                '''
+
+        bins = self.bin_frame(df)
+
+        return bins, self.score_matrix(bins)
+
+
+    def score(self, record):
+        ''' The function returns the probability of default of one loan.
+
+            Inputs:
+                - record: dictionary of raw values.
+                '''
+
+        if self.kind == 'estimator':
+            return self.score_batch([record])[0]
+
+        return self.score_bins(self.bins(record))
+
+
+    def score_batch(self, records):
+        ''' The function returns the probabilities of default of a batch of
+            loans. The logit and the trees score record by record in pure
+            python, the other estimators once on the whole batch.
+
+            Inputs:
+                - records: list of dictionaries of raw values.
+                '''
+
+        if self.kind != 'estimator':
+            return [self.score_bins(self.bins(i)) for i in records]
+
+        return self.score_matrix(np.array([self.bins(i) for i in records],
+                                          dtype = 'int32')).tolist()
+
+
+    def save(self, path):
+
+        dump(self.bundle, path)
+
+        return path
+
+
+def load_service(path):
+
+    return ScoringService(load(path))
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import os
+import sys
+import inspect
+import hashlib
+
+import joblib
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+def source_hash(stage):
+    ''' The function hashes the source of the module which defines a stage
+        and of the modules of the same directory it uses, eg. the Recoder of
+        the DataGetter, so that an edit of the code changes the key.
+
+        Inputs:
+            - stage: class or function of the stage.
+            '''
+
+    module = sys.modules[stage.__module__]
+    directory = os.path.dirname(os.path.abspath(module.__file__))
+    modules, stack = {}, [module]
+
+    while stack:
+        module = stack.pop()
+        modules[module.__name__] = module
+        for value in vars(module).values():
+            used = value if inspect.ismodule(value)\
+                else sys.modules.get(getattr(value, '__module__', None))
+            path = getattr(used, '__file__', None)
+            if path is not None and used.__name__ not in modules and\
+                os.path.dirname(os.path.abspath(path)) == directory:
+                stack.append(used)
+
+    sha = hashlib.sha1()
+    for name in sorted(modules):
+        with open(modules[name].__file__, 'rb') as file:
+            sha.update(file.read())
+
+    return sha.hexdigest()
+
+
+class StageCache():
+
+
+    def __init__(self, cache_dir, max_bytes = 20 * 2**30):
+        self.cache_dir: str = cache_dir
+        self.max_bytes: int = max_bytes # size limit of the whole cache.
+
+        os.makedirs(self.cache_dir, exist_ok = True)
+
+
+    def key(self, *parts):
+        ''' The function hashes the inputs of a stage. Data frames are hashed
+            by content, so that equal data give equal keys. Classes and
+            functions are hashed by their source, so that a stage edited
+            since is run again.
+
+            Inputs:
+                - parts: stage classes, input data and parameters.
+                '''
+
+        parts = [source_hash(i) if inspect.isclass(i) or inspect.isfunction(i)
+                 else i for i in parts]
+
+        return joblib.hash(parts)
+
+
+    def path(self, key):
+
+        return os.path.join(self.cache_dir, key + '.joblib')
+
+
+    def has(self, key):
+
+        return os.path.exists(self.path(key))
+
+
+    def load(self, key):
+
+        # The modification time marks the last use for the eviction.
+        os.utime(self.path(key))
+
+        return joblib.load(self.path(key))
+
+
+    def dump(self, key, value):
+
+        joblib.dump(value, self.path(key) + '.tmp')
+        os.replace(self.path(key) + '.tmp', self.path(key))
+        self.evict(keep = key)
+
+
+    def evict(self, keep = None):
+        ''' The function removes the least recently used entries until the
+            cache fits its size limit.
+
+            Inputs:
+                - keep: key which is never removed, ie. the newest entry.
+                '''
+
+        entries = [os.path.join(self.cache_dir, i)
+                   for i in os.listdir(self.cache_dir)
+                   if i.endswith('.joblib')]
+        entries = sorted(entries, key = os.path.getmtime)
+        total = sum(os.path.getsize(i) for i in entries)
+
+        for path in entries:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and path == self.path(keep):
+                continue
+            total -= os.path.getsize(path)
+            os.remove(path)
+
+        return total
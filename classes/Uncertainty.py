@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import itertools
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy.stats import norm
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+def sort_scores(y, y_pred):
+    ''' The function sorts the scores once and counts the defaults and
+        non-defaults per group of tied scores, in increasing order of the
+        score. The bootstrap and the DeLong test both work on these groups.
+
+        Inputs:
+            - y: binary target,
+            - y_pred: scores, a higher score for a default.
+            '''
+
+    y = np.asarray(y).ravel().astype('int64')
+    y_pred = np.asarray(y_pred).ravel()
+
+    order = np.argsort(y_pred, kind = 'mergesort')
+    y_sorted = y[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(y_pred[order])) + 1]
+    sizes = np.diff(np.r_[starts, y.size])
+    positives = np.add.reduceat(y_sorted, starts)
+    negatives = sizes - positives
+
+    # Non-defaults scored below every default and up to its tied scores.
+    group = np.repeat(np.arange(len(starts)), sizes)[y_sorted == 1]
+    through = np.cumsum(negatives)
+
+    return {'n' : y.size,
+            'order' : order,
+            'y_sorted' : y_sorted,
+            'starts' : starts,
+            'sizes' : sizes,
+            'positives' : positives,
+            'negatives' : negatives,
+            'below' : (through - negatives)[group],
+            'through' : through[group]}
+
+
+def auc_from_counts(positives, negatives):
+    ''' The function computes the AUC from the counts of defaults and
+        non-defaults per group of tied scores, in increasing order of the
+        score, as the Mann-Whitney statistic where ties count one half. The
+        counts may hold one replicate per row.
+        '''
+
+    negatives_through = np.cumsum(negatives, axis = -1)
+    pairs = np.einsum('...i,...i->...', positives, negatives_through) -\
+        0.5 * np.einsum('...i,...i->...', positives, negatives)
+
+    return pairs / (positives.sum(axis = -1) * negatives.sum(axis = -1))
+
+
+def bootstrap_batch(groups, n_replicates, seed):
+    ''' The function computes the AUCs of a batch of bootstrap resamples.
+        With few distinct scores, the counts per group and class are drawn
+        at once from their multinomial distribution. Otherwise the resamples
+        are drawn as a matrix of indices into the defaults and then the
+        non-defaults, both sorted by score. Every drawn default counts the
+        drawn non-defaults below it, ties one half. Both give the
+        distribution of resampling the rows.
+
+        Inputs:
+            - groups: output of sort_scores,
+            - n_replicates: number of resamples of the batch,
+            - seed: seed of the batch.
+            '''
+
+    rng = np.random.default_rng(seed)
+    n = groups['n']
+
+    if len(groups['starts']) * 20 < n:
+        cells = np.column_stack([groups['positives'],
+                                 groups['negatives']]).ravel()
+        counts = rng.multinomial(n, cells / n, size = n_replicates)
+        return auc_from_counts(counts[:, 0::2], counts[:, 1::2])
+
+    n_positives = len(groups['below'])
+    indices = rng.integers(0, n, size = (n_replicates, n), dtype = np.int32)
+    aucs = np.empty(n_replicates)
+
+    for i in range(n_replicates):
+        counts = np.bincount(indices[i], minlength = n)
+        negatives = np.r_[0, np.cumsum(counts[n_positives:])]
+        pairs = counts[:n_positives] @\
+            (negatives[groups['below']] + negatives[groups['through']])
+        aucs[i] = 0.5 * pairs /\
+            (counts[:n_positives].sum() * negatives[-1])
+
+    return aucs
+
+
+def structural_components(groups):
+    ''' The function computes the DeLong structural components of one score
+        from the midranks of its groups of tied scores, per default and per
+        non-default in the original order of the rows.
+        '''
+
+    positives, negatives = groups['positives'], groups['negatives']
+    n_positives, n_negatives = positives.sum(), negatives.sum()
+
+    # Midranks among all rows, the defaults and the non-defaults.
+    rank_all = groups['starts'] + (groups['sizes'] + 1) / 2
+    rank_positives = np.cumsum(positives) - positives + (positives + 1) / 2
+    rank_negatives = np.cumsum(negatives) - negatives + (negatives + 1) / 2
+
+    v10 = (rank_all - rank_positives) / n_negatives
+    v01 = 1 - (rank_all - rank_negatives) / n_positives
+
+    group = np.repeat(np.arange(len(groups['starts'])), groups['sizes'])
+    rows = np.empty(groups['n'])
+    default = np.empty(groups['n'], dtype = bool)
+    default[groups['order']] = groups['y_sorted'] == 1
+
+    rows[groups['order']] = v10[group]
+    v10 = rows[default]
+    rows[groups['order']] = v01[group]
+    v01 = rows[~default]
+
+    return v10, v01
+
+
+class Uncertainty():
+
+
+    def __init__(self, n_replicates = 1000, alpha = 0.05, batch_size = None,
+                 n_jobs = 1, set_seed = None):
+        self.n_replicates: int = n_replicates
+        self.alpha: float = alpha # 1 - confidence level.
+        self.batch_size: int = batch_size # resamples per batch.
+        self.n_jobs: int = n_jobs # processes of the batches.
+        self.set_seed: int = set_seed
+
+
+    def bootstrap(self, y, y_pred, groups = None):
+        ''' The function computes the AUCs of bootstrap resamples of one
+            sample, in batches of resamples spread over n_jobs processes.
+
+            Inputs:
+                - y: binary target,
+                - y_pred: scores,
+                - groups: output of sort_scores, if already sorted.
+                '''
+
+        groups = groups or sort_scores(y, y_pred)
+
+        # Batches of about 2**23 drawn indices.
+        batch_size = self.batch_size or max(1, 2**23 // groups['n'])
+        sizes = [min(batch_size, self.n_replicates - i)
+                 for i in range(0, self.n_replicates, batch_size)]
+        seeds = np.random.SeedSequence(self.set_seed).spawn(len(sizes))
+
+        replicates = Parallel(n_jobs = self.n_jobs)(
+            delayed(bootstrap_batch)(groups, size, seed)
+            for size, seed in zip(sizes, seeds))
+
+        return np.concatenate(replicates)
+
+
+    def confidence_intervals(self, targets, scores, model_names = None):
+        ''' The function computes percentile bootstrap intervals of the AUC
+            and the Gini of all models on all samples.
+
+            Inputs:
+                - targets: dictionary of the target per sample,
+                - scores: dictionary of the score matrix, rows by models, per
+                  sample,
+                - model_names: names of the columns of the score matrices.
+                '''
+
+        table = []
+
+        for sample, y in targets.items():
+            matrix = np.asarray(scores[sample])
+            for i in range(matrix.shape[1]):
+                groups = sort_scores(y, matrix[:, i])
+                roc_auc = auc_from_counts(groups['positives'],
+                                          groups['negatives'])
+                low, high = np.quantile(self.bootstrap(None, None, groups),
+                                        [self.alpha / 2, 1 - self.alpha / 2])
+                table.append({'model' : model_names[i]
+                              if model_names is not None else i,
+                              'sample' : sample,
+                              'auc' : roc_auc,
+                              'auc_low' : low,
+                              'auc_high' : high,
+                              'gini' : 2 * roc_auc - 1,
+                              'gini_low' : 2 * low - 1,
+                              'gini_high' : 2 * high - 1})
+
+        self.intervals = pd.DataFrame(table)
+
+        return self.intervals
+
+
+    def delong(self, y, scores, model_names = None):
+        ''' The function compares the AUCs of all pairs of models scored on
+            the same sample with the paired DeLong test. The structural
+            components come from one sort per model.
+
+            Inputs:
+                - y: binary target of the sample,
+                - scores: score matrix, rows by models,
+                - model_names: names of the columns of the score matrix.
+                '''
+
+        scores = np.asarray(scores)
+        model_names = model_names or list(range(scores.shape[1]))
+
+        components = [structural_components(sort_scores(y, scores[:, i]))
+                      for i in range(scores.shape[1])]
+        v10 = np.vstack([i[0] for i in components])
+        v01 = np.vstack([i[1] for i in components])
+        aucs = v10.mean(axis = 1)
+        covariance = np.atleast_2d(np.cov(v10)) / v10.shape[1] +\
+            np.atleast_2d(np.cov(v01)) / v01.shape[1]
+
+        table = []
+        for i, j in itertools.combinations(range(len(aucs)), 2):
+            variance = covariance[i, i] + covariance[j, j] -\
+                2 * covariance[i, j]
+            z = (aucs[i] - aucs[j]) / np.sqrt(variance)\
+                if variance > 0 else np.nan
+            table.append({'model_1' : model_names[i],
+                          'model_2' : model_names[j],
+                          'auc_1' : aucs[i],
+                          'auc_2' : aucs[j],
+                          'z' : z,
+                          'p_value' : 2 * norm.sf(np.abs(z))})
+
+        self.comparisons = pd.DataFrame(table)
+
+        return self.comparisons
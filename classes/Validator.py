@@ -10,220 +10,346 @@ Created on Sat Apr 20 23:00:34 2024
 # STEP 1: setup                                              #
 #------------------------------------------------------------#
 
+import os
+import json
+import time
+import hashlib
+import tempfile
+
 import pandas as pd
 import numpy as np
+import joblib
+from joblib import Parallel, delayed
+from sklearn.utils import _safe_indexing
+from threadpoolctl import threadpool_limits
 
 #from sklearn.metrics import confusion_matrix, ConfusionMatrixDisplay
-from sklearn.metrics import roc_curve, auc
 #from sklearn.metrics import precision_recall_curve, PrecisionRecallDisplay
 import matplotlib.pyplot as plt
 
+from Metrics import compute_metrics, evaluate
+from Reporter import Reporter, draw_roc, draw_cap, draw_ks, thin_curves
+from Uncertainty import Uncertainty
+
 #------------------------------------------------------------#
 # STEP 2: definitions                                        #
 #------------------------------------------------------------#
 
 
+def hash_model(model):
+    ''' The function identifies a model by the hash of its file, or of its
+        content when it is not saved yet.
+
+        Inputs:
+            - model: path of a joblib file or a fitted model.
+            '''
+
+    if isinstance(model, str):
+        digest = hashlib.sha256()
+        with open(model, 'rb') as file:
+            for block in iter(lambda: file.read(2**20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    return joblib.hash(model)
+
+
+def score_model(model, samples, path, shape, column, chunk_size):
+    ''' The function scores the default probability of one model over all
+        samples in chunks of rows, into its column of the score matrix.
+
+        Inputs:
+            - model: path of a joblib file or a fitted model,
+            - samples: list of feature matrices, stacked by rows,
+            - path, shape: memory-mapped score matrix, a column per model,
+            - column: column of the model,
+            - chunk_size: rows scored at once.
+            '''
+
+    if isinstance(model, str):
+        model = joblib.load(model)
+
+    scores = np.memmap(path, dtype = 'float32', mode = 'r+', shape = shape,
+                       order = 'F')
+
+    with threadpool_limits(limits = 1):
+        start = time.perf_counter()
+        offset = 0
+        for X in samples:
+            for i in range(0, X.shape[0], chunk_size):
+                chunk = _safe_indexing(X, slice(i, i + chunk_size))
+                scores[offset + i:offset + i + chunk.shape[0], column] =\
+                    model.predict_proba(chunk)[:, 1]
+            offset += X.shape[0]
+        elapsed = time.perf_counter() - start
+
+    scores.flush()
+
+    return shape[0] / elapsed
+
+
 class Validator():
     
     
-    def __init__(self, X_train, y_train, X_test, y_test, X_oot, y_oot):
+    def __init__(self, X_train, y_train, X_test, y_test, X_oot, y_oot,
+                 score_dir = None, chunk_size = 100000, n_jobs = 1):
         self.X_train: pd.DataFrame = X_train
         self.y_train: pd.DataFrame = y_train
         self.X_test: pd.DataFrame = X_test
         self.y_test: pd.DataFrame = y_test
         self.X_oot: pd.DataFrame = X_oot
         self.y_oot: pd.DataFrame = y_oot
+        self.score_dir: str = score_dir # cache of the scores, None for a temp one.
+        self.temp_dir = None # temporary score directory, removed by close.
+        self.chunk_size: int = chunk_size # rows scored at once.
+        self.n_jobs: int = n_jobs # models scored in parallel.
+        self.model_hashes: dict = {} # models in memory and their hashes by id.
+    
+    
+    def score(self, models):
+        ''' The function scores all models over the train, test and oot rows
+            into one memory-mapped float32 matrix of rows by models, in
+            chunks of rows and in parallel across models. The matrix is kept
+            per data in the score directory, with a manifest of its columns
+            keyed by the model hash, so that a model which is validated again
+            is not scored again. The throughput is reported per model.
+
+            Inputs:
+                - models: list of fitted models or paths of joblib files.
+                '''
+
+        samples = [self.X_train, self.X_test, self.X_oot]
+        self.sizes = [X.shape[0] for X in samples]
+        n_rows = sum(self.sizes)
+
+        if self.score_dir is None:
+            self.temp_dir = tempfile.TemporaryDirectory(
+                prefix = 'scores_', ignore_cleanup_errors = True)
+            self.score_dir = self.temp_dir.name
+        directory = os.path.join(self.score_dir, joblib.hash(samples))
+        os.makedirs(directory, exist_ok = True)
+        path = os.path.join(directory, 'scores.float32')
+        manifest_path = os.path.join(directory, 'manifest.json')
+
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as file:
+                manifest = json.load(file)
+        else:
+            manifest = {'n_rows' : n_rows, 'columns' : {},
+                        'rows_per_second' : {}}
+
+        # A model in memory is hashed once, the state of some models changes
+        #  when they predict, eg. the query counters of a KD tree. The model
+        #  is kept with its hash, an id is reused by another object once the
+        #  first one is collected.
+        for i in models:
+            if not isinstance(i, str) and\
+                self.model_hashes.get(id(i), (None, None))[0] is not i:
+                self.model_hashes[id(i)] = (i, hash_model(i))
+        keys = [hash_model(i) if isinstance(i, str)
+                else self.model_hashes[id(i)][1] for i in models]
+        new = [(model, key) for model, key in zip(models, keys)
+               if key not in manifest['columns']]
+        new = list({key : (model, key) for model, key in new}.values())
+
+        # Column-major storage, the columns of new models are appended.
+        for model, key in new:
+            manifest['columns'][key] = len(manifest['columns'])
+        shape = (n_rows, max(len(manifest['columns']), 1))
+        with open(path, 'ab') as file:
+            file.truncate(shape[0] * shape[1] * 4)
+
+        throughput = Parallel(n_jobs = self.n_jobs)(
+            delayed(score_model)(model, samples, path, shape,
+                                 manifest['columns'][key], self.chunk_size)
+            for model, key in new)
+
+        for (model, key), rows_per_second in zip(new, throughput):
+            manifest['rows_per_second'][key] = rows_per_second
+            name = os.path.basename(model) if isinstance(model, str) else\
+                type(getattr(model, 'best_estimator_', model)).__name__
+            print(f'{name}: {rows_per_second:,.0f} rows/s')
+
+        with open(manifest_path + '.tmp', 'w') as file:
+            json.dump(manifest, file, indent = 1)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+        self.scores = np.memmap(path, dtype = 'float32', mode = 'r',
+                                shape = shape, order = 'F')
+        self.columns = [manifest['columns'][key] for key in keys]
+        self.throughput = pd.DataFrame(
+            {'model_hash' : keys,
+             'rows_per_second' : [manifest['rows_per_second'][key]
+                                  for key in keys],
+             'cached' : [key not in [i[1] for i in new] for key in keys]})
+
+        return self.scores
+
+
+    def close(self):
+        ''' The function removes the score matrix of a Validator with no
+            score directory, a given score directory is kept as the cache.
+            '''
+
+        if self.temp_dir is not None:
+            self.scores = None
+            self.temp_dir.cleanup()
+            self.temp_dir = self.score_dir = None
+
+        return self.score_dir
     
     
-    def predict(self, model):
+    def predict(self, model, column = None):
+        ''' The function reads the train, test and oot scores of a model from
+            the score matrix, a model which is not in it is scored first.
+
+            Inputs:
+                - model: fitted model or path of a joblib file,
+                - column: column of the model, if already scored.
+                '''
         
-        self.y_train_pred = model.predict_proba(self.X_train)[:,1]
-        self.y_test_pred = model.predict_proba(self.X_test)[:,1]
-        self.y_oot_pred = model.predict_proba(self.X_oot)[:,1]
+        if column is None:
+            self.score([model])
+            column = self.columns[0]
+
+        scores = self.scores[:, column]
+        train_end, test_end = np.cumsum(self.sizes[:2])
+        self.y_train_pred = scores[:train_end]
+        self.y_test_pred = scores[train_end:test_end]
+        self.y_oot_pred = scores[test_end:]
     
         return (self.y_train_pred, self.y_test_pred, self.y_oot_pred)
     
     
-    def plot_roc(self):
+    def split_scores(self):
+        ''' The function returns the targets and the score matrices of the
+            scored models per sample.
+            '''
+
+        train_end, test_end = np.cumsum(self.sizes[:2])
+        scores = self.scores[:, self.columns]
+        targets = {'train' : self.y_train, 'test' : self.y_test,
+                   'oot' : self.y_oot}
+        scores = {'train' : scores[:train_end],
+                  'test' : scores[train_end:test_end],
+                  'oot' : scores[test_end:]}
+
+        return targets, scores
+
+
+    def measure(self):
+        ''' The function computes the AUC, Gini, CAP and KS of all scored
+            models on the train, test and oot samples at once, from one sort
+            per score vector, with no plotting.
+            '''
+
+        self.curves, self.metrics = evaluate(*self.split_scores())
+
+        return self.metrics
+
+
+    def measure_uncertainty(self, n_replicates = 1000, alpha = 0.05,
+                            model_names = None, set_seed = None):
+        ''' The function adds bootstrap intervals of the AUC and the Gini of
+            all scored models per sample, and compares the models pairwise on
+            the oot sample with the DeLong test.
+
+            Inputs:
+                - n_replicates: number of bootstrap resamples,
+                - alpha: 1 - confidence level,
+                - model_names: names of the models,
+                - set_seed: seed of the resamples.
+                '''
+
+        targets, scores = self.split_scores()
+        uncertainty = Uncertainty(n_replicates, alpha, n_jobs = self.n_jobs,
+                                  set_seed = set_seed)
+
+        self.intervals = uncertainty.confidence_intervals(targets, scores,
+                                                          model_names)
+        self.comparisons = uncertainty.delong(targets['oot'], scores['oot'],
+                                              model_names)
+
+        return self.intervals, self.comparisons
+
+
+    def get_curves(self, model, max_points = 2000):
+        ''' The function returns the curves to plot per sample of a measured
+            model, or of the last predictions when model is None.
+            '''
+
+        if model is None:
+            curves = {'train' : compute_metrics(self.y_train,
+                                                self.y_train_pred),
+                      'test' : compute_metrics(self.y_test, self.y_test_pred),
+                      'oot' : compute_metrics(self.y_oot, self.y_oot_pred)}
+        else:
+            curves = {sample : self.curves[model, sample]
+                      for sample in ['train', 'test', 'oot']}
+
+        return {sample : thin_curves(curves[sample], max_points)
+                for sample in curves}
+    
+    
+    def plot_roc(self, model = None):
         
-        plt.figure(figsize=(5, 5))
-         
-        fpr_train, tpr_train, _ = roc_curve(self.y_train, self.y_train_pred)
-        self.roc_auc_train = auc(fpr_train, tpr_train)
+        curves = self.get_curves(model)
+        self.roc_auc_train = curves['train']['auc']
+        self.roc_auc_test = curves['test']['auc']
+        self.roc_auc_oot = curves['oot']['auc']
         
-        fpr_test, tpr_test, _ = roc_curve(self.y_test, self.y_test_pred)
-        self.roc_auc_test = auc(fpr_test, tpr_test)
-
-        fpr_oot, tpr_oot, _ =\
-            roc_curve(self.y_oot, self.y_oot_pred)
-        self.roc_auc_oot = auc(fpr_oot, tpr_oot)
-          
-        plt.plot(fpr_train, tpr_train, ':',
-                 label = f'(train set, AUC = {self.roc_auc_train:.2f})', 
-                 color = 'k')
-        plt.plot(fpr_test, tpr_test,
-                 label = f'(test set, AUC = {self.roc_auc_test:.2f})', 
-                 color = 'k')
-        plt.plot(fpr_oot, tpr_oot, '--',
-                 label = f'(oot set, AUC = {self.roc_auc_oot:.2f})', 
-                 color = 'k')
-        plt.plot([0, 1], [0, 1], color = 'k')
-         
-        # Labels
-        plt.xlabel('FPR')
-        plt.ylabel('TPR')
-        for pos in ['right', 'top']: 
-            plt.gca().spines[pos].set_visible(False) 
-        plt.legend()
-        plt.legend()
+        figure, ax = plt.subplots(figsize=(5, 5))
+        draw_roc(ax, curves)
         plt.show()
     
         return self.roc_auc_train, self.roc_auc_test, self.roc_auc_oot
     
     
-    def plot_cap(self):
-            
-        
-        def prep_cap_inputs(y, y_pred):
-            
-            N = len(y)
-            positives = np.sum(y)
-            y_sort = y[y_pred.argsort()[::-1][:N]]
-            p_positives = np.append([0], np.cumsum(y_sort))/positives
-            p_N = np.arange(0, N + 1) / N
-            fpr, tpr, _ = roc_curve(y, y_pred)
-            roc_auc = auc(fpr, tpr)
-            gini = roc_auc * 2 - 1
-                    
-            return N, positives, p_N, p_positives, gini
-    
-    
-        # Initialization.
-        plt.figure(figsize=(5, 5))
-    
-        # Random model.
-        plt.plot([0, 1], [0, 1], '--', color = 'k')
-    
-        # Train.
-        N, positives, p_N, p_positives, gini =\
-            prep_cap_inputs(self.y_train, self.y_train_pred)
-        plt.plot(p_N, p_positives, ":", color="k",
-                 label="train set, Gini: {:.5f}".format(gini))
-    
-        # Test.
-        N, positives, p_N, p_positives, gini =\
-            prep_cap_inputs(self.y_test, self.y_test_pred)
-        plt.plot(p_N, p_positives, color="k",
-                 label="test set, Gini: {:.5f}".format(gini))    
-    
-        # oot.
-        N, positives, p_N, p_positives, gini =\
-            prep_cap_inputs(self.y_oot, self.y_oot_pred)
-        plt.plot(p_N, p_positives, "--", color="k",
-                 label="oot set, Gini: {:.5f}".format(gini))        
-    
-        # Perfect model plot.
-        plt.plot([0, positives / N, 1], [0, 1, 1], color='k',
-                 label="Perfect model")
-        
-        # Labels.
-        plt.xlabel('Fraction of all population')
-        plt.ylabel('Fraction of event population')
-        for pos in ['right', 'top']: 
-            plt.gca().spines[pos].set_visible(False) 
-        plt.legend(loc='lower right')
-    
+    def plot_cap(self, model = None):
     
-    def plot_ks(self):
+        figure, ax = plt.subplots(figsize=(5, 5))
+        draw_cap(ax, self.get_curves(model))
     
-        
-        def prep_ks_inputs(y, y_pred):
-            
-            N = len(y)
-            positives = np.sum(y)
-            negatives = N - positives
-            ids = y_pred.argsort()
-            y_sort = y[ids]
-            y_pred_sort = y_pred[ids]
-            
-            N_cum = np.arange(0, N)
-            positives_cum = np.cumsum(y_sort)
-            negatives_cum = N_cum - positives_cum
-        
-            p_positives = positives_cum / positives
-            p_negatives = negatives_cum / negatives
-        
-            p_diff = p_positives - p_negatives
-            ks_score = np.max(p_diff)
-            ks_max_id = np.argmax(p_diff)
-                    
-            return y_pred_sort, p_positives, p_negatives, ks_max_id, ks_score
     
+    def plot_ks(self, model = None):
     
-        # Initialization.
-        plt.figure(figsize=(5, 5))
+        figure, ax = plt.subplots(figsize=(5, 5))
+        draw_ks(ax, self.get_curves(model))
     
-        # Train set.
-        y_pred_sort, p_positives, p_negatives, ks_max_id, ks_score =\
-            prep_ks_inputs(self.y_train, self.y_train_pred)
-        
-        plt.plot(y_pred_sort, p_positives, ":", color="k", 
-                 label="train set defaults")
-        plt.plot(y_pred_sort, p_negatives, ":", color="k", 
-                 label="train set non-defaults")
-    
-        # Test set.
-        y_pred_sort, p_positives, p_negatives, ks_max_id, ks_score =\
-            prep_ks_inputs(self.y_test, self.y_test_pred)
-        
-        plt.plot(y_pred_sort, p_positives, color="k",
-                 label="test set defaults")
-        plt.plot(y_pred_sort, p_negatives, color="k", 
-                 label="test set non-defaults")
-        
-        # oot set.
-        y_pred_sort, p_positives, p_negatives, ks_max_id, ks_score =\
-            prep_ks_inputs(self.y_oot, self.y_oot_pred)
-        
-        plt.plot(y_pred_sort, p_positives, "--", color="k",
-                 label="oot set defaults")
-        plt.plot(y_pred_sort, p_negatives, "--", color="k", 
-                 label="oot set non-defaults")
-         
-        plt.vlines(y_pred_sort[ks_max_id], ymin=p_positives[ks_max_id],
-                   ymax=p_negatives[ks_max_id], color="k")
-    
-        pos_x = p_positives[ks_max_id] + 0.02
-        pos_y = 0.5 * (p_negatives[ks_max_id] + p_positives[ks_max_id])
-        text = "KS: {:.2%} at {:.2f}".format(ks_score, p_positives[ks_max_id])
-        plt.text(pos_x, pos_y, text, fontsize=12, rotation_mode="anchor")
-        for pos in ['right', 'top']: 
-            plt.gca().spines[pos].set_visible(False) 
-        plt.legend(loc='lower right')
-    
-
-    def run(self, models):
-        
-        self.aucs_train = []
-        self.aucs_test = []
-        self.aucs_oot = []
+
+    def run(self, models, plot = True, report_dir = None, model_names = None,
+            prefix = ''):
+        ''' The function scores and measures the models. The ROC curves are
+            shown per model, or with a report directory all panels are
+            rendered headless into a report of PNGs, a PDF and the metrics,
+            with no figure left open. A temporary score matrix is removed at
+            the end, the curves and metrics are kept.
+
+            Inputs:
+                - models: list of fitted models or paths of joblib files,
+                - plot: whether to show the ROC curves,
+                - report_dir: directory of the report, None for no report,
+                - model_names: names of the models in the report,
+                - prefix: prefix of the report files.
+                '''
         
-        for i in models:
-            self.predict(i)
-            
-            self.plot_roc()
-            self.aucs_train.append(self.roc_auc_train)
-            self.aucs_test.append(self.roc_auc_test)
-            self.aucs_oot.append(self.roc_auc_oot)
+        self.score(models)
+        self.measure()
         
-            #self.plot_cap()
-            #self.plot_ks()
+        if report_dir is not None:
+            Reporter(report_dir, n_jobs = self.n_jobs)\
+                .run(self.curves, self.metrics, model_names, prefix)
+        elif plot:
+            for i in range(len(models)):
+                self.plot_roc(i)
+                #self.plot_cap(i)
+                #self.plot_ks(i)
             
-        self.aucs_train = pd.DataFrame(self.aucs_train, columns = ['train_auc'])
-        self.aucs_test = pd.DataFrame(self.aucs_test, columns = ['test_auc'])
-        self.aucs_oot = pd.DataFrame(self.aucs_oot, columns = ['oot_auc'])
-        self.aucs = self.aucs_train.join(self.aucs_test, how = 'left')
-        self.aucs = self.aucs.join(self.aucs_oot, how = 'left')
+        self.aucs = self.metrics.pivot(index = 'model', columns = 'sample',
+                                       values = 'auc')\
+            [['train', 'test', 'oot']].add_suffix('_auc')\
+            .rename_axis(index = None, columns = None)
+        self.close()
         
         return self.aucs
         
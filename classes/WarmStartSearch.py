@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.utils import _safe_indexing
+
+from Scheduler import SearchResult, cv_results
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+def grow_and_score(estimator, X, y, train, test, params, checkpoints):
+    ''' The function grows one ensemble on one fold and scores it by
+        accuracy at every checkpoint size. Forests and bagging grow with
+        warm_start, boosting is fitted once at the largest size and scored
+        per stage. Both give the ensembles of a fit from scratch.
+
+        Inputs:
+            - estimator: unfitted ensemble,
+            - X, y: training data,
+            - train, test: indices of the fold,
+            - params: hyperparameters other than n_estimators,
+            - checkpoints: sorted sizes of the ensemble.
+            '''
+
+    X_train, y_train = _safe_indexing(X, train), _safe_indexing(y, train)
+    X_test, y_test = _safe_indexing(X, test), np.asarray(_safe_indexing(y, test))
+    model = clone(estimator).set_params(**clone(params, safe = False))
+    scores, fit_times, score_times = [], [], []
+
+    if 'warm_start' in model.get_params():
+        model.set_params(warm_start = True)
+        fit_time = 0
+        for n_estimators in checkpoints:
+            start = time.perf_counter()
+            model.set_params(n_estimators = n_estimators)
+            model.fit(X_train, y_train)
+            fit_time += time.perf_counter() - start
+            start = time.perf_counter()
+            scores.append(model.score(X_test, y_test))
+            fit_times.append(fit_time)
+            score_times.append(time.perf_counter() - start)
+    else:
+        start = time.perf_counter()
+        model.set_params(n_estimators = checkpoints[-1])
+        model.fit(X_train, y_train)
+        fit_time = time.perf_counter() - start
+        start = time.perf_counter()
+        stages = [np.mean(i == y_test) for i in model.staged_predict(X_test)]
+        score_time = time.perf_counter() - start
+        # Boosting which stops early keeps its last stage.
+        for n_estimators in checkpoints:
+            scores.append(stages[min(n_estimators, len(stages)) - 1])
+            fit_times.append(fit_time * n_estimators / checkpoints[-1])
+            score_times.append(score_time * n_estimators / checkpoints[-1])
+
+    return scores, fit_times, score_times
+
+
+class WarmStartSearch():
+
+
+    def __init__(self, estimator, param_grid, cv = 5, n_jobs = -1):
+        self.estimator = estimator
+        self.param_grid: dict = param_grid # grid with n_estimators.
+        self.cv: int = cv
+        self.n_jobs: int = n_jobs
+
+
+    def fit(self, X, y):
+        ''' The function searches the grid of an ensemble with one growing
+            ensemble per fold and per value of the other hyperparameters,
+            instead of one fit per n_estimators. The results keep the shape
+            and the order of the candidates of GridSearchCV, the best
+            candidate is refitted on the whole sample.
+
+            Inputs:
+                - X: training features,
+                - y: training target.
+                '''
+
+        candidates = list(ParameterGrid(self.param_grid))
+        folds = list(StratifiedKFold(self.cv).split(np.zeros(len(y)), y))
+
+        # Candidates which differ in n_estimators only share an ensemble.
+        groups = {}
+        for i, params in enumerate(candidates):
+            params = {key : value for key, value in params.items()
+                      if key != 'n_estimators'}
+            groups.setdefault(repr(sorted(params.items())), (params, []))[1]\
+                .append(i)
+
+        tasks = [(params, sorted(members,
+                                 key = lambda i: candidates[i]['n_estimators']),
+                  k, train, test)
+                 for params, members in groups.values()
+                 for k, (train, test) in enumerate(folds)]
+
+        results = Parallel(n_jobs = self.n_jobs)(
+            delayed(grow_and_score)(self.estimator, X, y, train, test, params,
+                                    [candidates[i]['n_estimators']
+                                     for i in members])
+            for params, members, k, train, test in tasks)
+
+        scores = np.full((len(candidates), self.cv), np.nan)
+        fit_times = np.zeros_like(scores)
+        score_times = np.zeros_like(scores)
+        for (params, members, k, train, test), result in zip(tasks, results):
+            scores[members, k], fit_times[members, k],\
+                score_times[members, k] = result
+
+        results = cv_results(candidates, scores, fit_times, score_times)
+        best_params = candidates[int(np.argmin(results['rank_test_score']))]
+
+        start = time.perf_counter()
+        best_estimator = clone(self.estimator)\
+            .set_params(**clone(best_params, safe = False)).fit(X, y)
+
+        self.search = SearchResult(self.estimator, self.param_grid, results,
+                                   best_estimator,
+                                   time.perf_counter() - start)
+
+        return self.search
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from joblib import dump, load
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+# Value which is not a category of any variable, it yields the WoE of the
+#  unknown categories.
+UNKNOWN_CATEGORY = '__unknown_category__'
+
+
+class WoETransformer():
+
+
+    def __init__(self, tables = None):
+        self.tables: dict = tables or {} # lookup tables per variable.
+
+
+    def compile(self, binning_process):
+        ''' The function exports the selected variables of a fitted binning
+            process to lookup tables: sorted split points and a WoE per bin
+            for numerical variables, categories and a WoE per category for
+            categorical variables. The WoE values are read from the binning
+            itself at one point of every bin, so the tables reproduce its
+            transform exactly.
+
+            Inputs:
+                - binning_process: fitted optbinning BinningProcess.
+                '''
+
+        self.tables = {}
+
+        for name in map(str, binning_process.get_support(names = True)):
+            optb = binning_process.get_binned_variable(name)
+
+            if optb.dtype == 'numerical':
+                splits = np.asarray(optb.splits, dtype = 'float64')
+                # The bins are closed on the left, every split is a point of
+                #  the next bin.
+                probes = np.concatenate([[-np.inf], splits, [np.nan]])
+                woe = optb.transform(probes, metric = 'woe')
+
+                self.tables[name] = {'dtype' : 'numerical',
+                                     'splits' : splits,
+                                     'woe' : woe[:-1],
+                                     'missing' : woe[-1]}
+            else:
+                categories = [j for i in optb.splits for j in list(i)]
+                categories = list(dict.fromkeys(
+                    categories + list(optb._cat_others or [])))
+                probes = pd.Series(categories + [UNKNOWN_CATEGORY, np.nan],
+                                   dtype = 'object')
+                woe = optb.transform(probes, metric = 'woe')
+
+                self.tables[name] = {'dtype' : 'categorical',
+                                     'categories' : np.array(categories,
+                                                             dtype = 'object'),
+                                     'woe' : woe[:-2],
+                                     'unknown' : woe[-2],
+                                     'missing' : woe[-1]}
+
+        return self.tables
+
+
+    def transform_variable(self, name, x, out = None):
+        ''' The function maps one variable to its WoE values.
+
+            Inputs:
+                - name: name of the variable,
+                - x: values of the variable,
+                - out: optional array which receives the WoE values.
+                '''
+
+        table = self.tables[name]
+        x = pd.Series(x)
+        missing = x.isnull().to_numpy()
+
+        if table['dtype'] == 'numerical':
+            values = x.to_numpy(dtype = 'float64', na_value = np.nan)
+            # Equal to np.digitize with right = False, as in optbinning.
+            indices = np.searchsorted(table['splits'], values, side = 'right')
+            lookup = table['woe']
+        else:
+            # Categories out of the table get the last code, the unknown WoE.
+            indices = pd.Index(table['categories']).get_indexer(x)
+            lookup = np.append(table['woe'], table['unknown'])
+
+        if out is None:
+            out = lookup[indices]
+        else:
+            out[:] = lookup[indices]
+        out[missing] = table['missing']
+
+        return out
+
+
+    def transform_array(self, X, out = None):
+        ''' The function maps all compiled variables of a frame to a matrix
+            of WoE values, in the order of the tables.
+
+            Inputs:
+                - X: frame which holds the compiled variables,
+                - out: optional matrix, eg. float32, which receives the values.
+                '''
+
+        if out is None:
+            out = np.empty((len(X), len(self.tables)), dtype = 'float64')
+
+        for i, name in enumerate(self.tables):
+            self.transform_variable(name, X[name], out = out[:, i])
+
+        return out
+
+
+    def transform(self, X):
+
+        return pd.DataFrame(self.transform_array(X),
+                            columns = list(self.tables), index = X.index)
+
+
+    def check(self, binning_process, X):
+        ''' The function compares the lookup tables with the transform of the
+            binning process they were compiled from.
+
+            Inputs:
+                - binning_process: fitted optbinning BinningProcess,
+                - X: frame to transform.
+                '''
+
+        expected = binning_process.transform(X, metric = 'woe')
+
+        return np.array_equal(self.transform_array(X),
+                              expected[list(self.tables)].to_numpy(),
+                              equal_nan = True)
+
+
+    def stream(self, path, chunksize = 100000, keep = None):
+        ''' The function reads a parquet file in chunks and yields the WoE
+            values of every chunk, so that files larger than memory can be
+            scored.
+
+            Inputs:
+                - path: parquet file, eg. output of the DataGetter,
+                - chunksize: number of rows per chunk,
+                - keep: columns passed through unchanged, eg. the target.
+                '''
+
+        keep = list(keep or [])
+        parquet_file = pq.ParquetFile(path)
+
+        for batch in parquet_file.iter_batches(batch_size = chunksize,
+                                               columns = keep +\
+                                                   list(self.tables)):
+            chunk = batch.to_pandas()
+            chunk_woe = self.transform(chunk)
+            for name in reversed(keep):
+                chunk_woe.insert(0, name, chunk[name])
+
+            yield chunk_woe
+
+
+    def run_streaming(self, path, output_path, chunksize = 100000, keep = None):
+
+        writer = None
+
+        for chunk_woe in self.stream(path, chunksize, keep):
+            if writer is None:
+                table = pa.Table.from_pandas(chunk_woe, preserve_index = False)
+                writer = pq.ParquetWriter(output_path, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk_woe, schema = writer.schema,
+                                             preserve_index = False)
+            writer.write_table(table)
+
+        if writer is not None:
+            writer.close()
+
+        return output_path
+
+
+    def save(self, path):
+
+        dump(self.tables, path)
+
+        return path
+
+
+    def load(self, path):
+
+        self.tables = load(path)
+
+        return self.tables
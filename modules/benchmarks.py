@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+
+#------------------------------------------------------------#
+# STEP 1: general imports and paths                          #
+#------------------------------------------------------------#
+
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from collinearity import SelectNonCollinear
+from sklearn.feature_selection import f_classif
+from sklearn.metrics import roc_auc_score
+
+from Ingestor import Ingestor
+from DataGetter import DataGetter
+from Compactor import Compactor
+from Preprocessor import Preprocessor
+from Decorrelator import Decorrelator
+from Modeler import Modeler
+from ScoringService import bundle_from_modeler, ScoringService
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+def prepare_preprocessor(df, target, oot_year, set_seed = 130816,
+                         undersample = False, n_jobs = None):
+    ''' The function runs the stages of the Preprocessor which precede the
+        binning, so that the benchmarks time the binning only.
+        '''
+
+    preprocessor = Preprocessor(set_seed, target, df, undersample, False,
+                                oot_year, 'woe', n_jobs = n_jobs)
+    preprocessor.retain_oot()
+    preprocessor.split_train_test()
+    preprocessor.undersample_train()
+    preprocessor.list_categorical()
+
+    return preprocessor
+
+
+def benchmark_binning(df, target, oot_year, n_jobs_list = [2, 4, 8]):
+    ''' The function times bin_and_transform of the serial fit against the
+        parallel fit of the variable shards and checks that both select the
+        same binning.
+
+        Inputs:
+            - df: output of the DataGetter,
+            - target: name of the target variable,
+            - oot_year: out of time period, format yyyymm,
+            - n_jobs_list: numbers of processes of the parallel fits.
+            '''
+
+    rows = []
+    summaries = {}
+
+    for n_jobs in [None] + list(n_jobs_list):
+        preprocessor = prepare_preprocessor(df, target, oot_year,
+                                            n_jobs = n_jobs)
+
+        start = time.perf_counter()
+        preprocessor.bin_and_transform()
+        seconds = time.perf_counter() - start
+
+        summaries[n_jobs] = preprocessor.performance_summary
+        rows.append({'n_jobs' : n_jobs or 1,
+                     'seconds' : seconds,
+                     'equal_to_serial' : summaries[n_jobs].equals(
+                         summaries[None])})
+
+    scaling = pd.DataFrame(rows)
+    scaling['speedup'] = scaling['seconds'].iloc[0] / scaling['seconds']
+
+    return scaling
+
+
+def legacy_transform(preprocessor, df):
+    ''' The function applies the binning with the former reset_index and
+        join round trip, the baseline of benchmark_transform_memory.
+        '''
+
+    var_names = list(df.loc[:, df.columns != preprocessor.target].columns)
+    X_binned = preprocessor.binning_process.transform(df[var_names],
+                                                      metric = 'woe')
+    y = pd.DataFrame(df[preprocessor.target]).reset_index()
+    df_binned = y.join(X_binned, how = 'left')
+    df_binned = df_binned.drop(['index'], axis = 1)
+
+    return df_binned
+
+
+def measure(function, *args):
+    ''' The function returns the run time and the peak of the memory
+        allocated by a function call.
+        '''
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return seconds, peak
+
+
+def benchmark_transform_memory(df, target, oot_year):
+    ''' The function measures the peak memory of the WoE transform of all
+        samples, for the former round trip through reset_index and join and
+        for the preallocated float32 blocks.
+
+        Inputs:
+            - df: output of the DataGetter,
+            - target: name of the target variable,
+            - oot_year: out of time period, format yyyymm.
+            '''
+
+    preprocessor = prepare_preprocessor(df, target, oot_year)
+    samples = {'train' : preprocessor.df_train,
+               'test' : preprocessor.df_test,
+               'oot' : preprocessor.df_oot}
+    preprocessor.bin_and_transform()
+
+    rows = []
+    for sample, df_sample in samples.items():
+        for path, function in [('join', legacy_transform),
+                               ('block', Preprocessor.assemble_sample)]:
+            seconds, peak = measure(function, preprocessor, df_sample)
+            rows.append({'sample' : sample, 'path' : path,
+                         'seconds' : seconds, 'peak_mb' : peak / 2**20})
+
+    return pd.DataFrame(rows)
+
+
+def simulate_features(n_rows, n_columns, set_seed = 130816):
+    ''' The function simulates correlated float32 features, driven by a
+        few common factors as the WoE features, and a binary target.
+        '''
+
+    rng = np.random.default_rng(set_seed)
+    factors = rng.normal(size = (n_rows, 20))
+    loadings = rng.normal(size = (20, n_columns)) *\
+        (rng.random((20, n_columns)) < 0.2)
+    X = (factors @ loadings + rng.normal(size = (n_rows, n_columns)))\
+        .astype('float32')
+    y = (rng.random(n_rows) < 1 / (1 + np.exp(2 - factors[:, 0])))\
+        .astype('int64')
+
+    return X, y
+
+
+def benchmark_decorrelation(n_columns_list = [100, 500, 2000],
+                            n_rows = 50000):
+    ''' The function times the built-in decorrelation engine against
+        collinearity.SelectNonCollinear at the threshold of the
+        Preprocessor and checks that both keep the same features.
+
+        Inputs:
+            - n_columns_list: numbers of simulated features,
+            - n_rows: number of simulated observations.
+            '''
+
+    rows = []
+
+    for n_columns in n_columns_list:
+        X, y = simulate_features(n_rows, n_columns)
+        masks = {}
+
+        for engine, selector in [
+                ('collinearity', SelectNonCollinear(correlation_threshold = 0.5,
+                                                    scoring = f_classif)),
+                ('decorrelator', Decorrelator(correlation_threshold = 0.5,
+                                              scoring = f_classif))]:
+            start = time.perf_counter()
+            selector.fit(X, y)
+            seconds = time.perf_counter() - start
+
+            masks[engine] = np.asarray(selector.get_support())
+            rows.append({'n_columns' : n_columns, 'engine' : engine,
+                         'seconds' : seconds,
+                         'n_selected' : masks[engine].sum()})
+
+        rows[-1]['equal_selection'] = np.array_equal(masks['collinearity'],
+                                                     masks['decorrelator'])
+
+    return pd.DataFrame(rows)
+
+
+def benchmark_search_strategies(df_train, df_test, df_oot, target,
+                                families = ['ann', 'knn', 'svm', 'rf'],
+                                strategies = ['grid', 'halving', 'random']):
+    ''' The function times the hyperparameter search of model families per
+        search strategy and reports the difference of the test AUC of the
+        best model from the exhaustive grid.
+
+        Inputs:
+            - df_train, df_test, df_oot: outputs of the Preprocessor,
+            - target: name of the target variable,
+            - families: model families, keys of Modeler.define_models,
+            - strategies: search strategies of the Modeler.
+            '''
+
+    methods = {'logit' : 'model_logit', 'ann' : 'model_ann',
+               'knn' : 'model_knn', 'svm' : 'model_svm',
+               'bag' : 'model_bagging', 'rf' : 'model_rf',
+               'adaboost' : 'model_adaboost'}
+    rows = []
+
+    for strategy in strategies:
+        modeler = Modeler(130816, target, False, df_train, df_test, df_oot,
+                          search_strategy = strategy)
+        modeler.select_features(None, False)
+
+        for family in families:
+            start = time.perf_counter()
+            model = getattr(modeler, methods[family])()
+            seconds = time.perf_counter() - start
+
+            rows.append({'family' : family, 'strategy' : strategy,
+                         'seconds' : seconds,
+                         'test_auc' : roc_auc_score(
+                             modeler.y_test,
+                             model.predict_proba(modeler.X_test)[:, 1])})
+
+    results = pd.DataFrame(rows)
+    grid = results.loc[results['strategy'] == 'grid']\
+        .set_index('family')[['seconds', 'test_auc']]
+    results['speedup'] = results['family'].map(grid['seconds']) /\
+        results['seconds']
+    results['auc_difference'] = results['test_auc'] -\
+        results['family'].map(grid['test_auc'])
+
+    return results
+
+
+def benchmark_scoring_latency(df0, df, var_map, value_map, target, oot_year,
+                              families = ['logit', 'rf', 'knn'],
+                              n_records = 1000, batch_size = 100):
+    ''' The function times the ScoringService on raw out of time loans:
+        the percentiles of the latency of one loan, the throughput of micro-
+        batches and the largest difference from the fitted pipeline.
+
+        Inputs:
+            - df0: raw dataset, output of the Ingestor,
+            - df, var_map: outputs of the DataGetter,
+            - value_map: mapping table of values,
+            - target: name of the target variable,
+            - oot_year: out of time period, format yyyymm,
+            - families: model families, keys of Modeler.define_models,
+            - n_records: number of scored loans,
+            - batch_size: loans per micro-batch.
+            '''
+
+    methods = {'logit' : 'model_logit', 'ann' : 'model_ann',
+               'knn' : 'model_knn', 'svm' : 'model_svm',
+               'bag' : 'model_bagging', 'rf' : 'model_rf',
+               'adaboost' : 'model_adaboost'}
+
+    preprocessor = Preprocessor(130816, target, df, False, False, oot_year,
+                                'bins')
+    df_train, df_test, df_oot, performance_summary = preprocessor.run()
+    modeler = Modeler(130816, target, False, df_train, df_test, df_oot)
+    modeler.select_features(None, False)
+    modeler.apply_one_hot('bins')
+
+    # Raw records as they arrive, with None for the missing values.
+    records = df0.loc[df['obs_yyyymm'].to_numpy() == oot_year].astype(object)
+    records = records.where(records.notna(), None)\
+        .to_dict('records')[:n_records]
+    rows = []
+
+    for family in families:
+        model = getattr(modeler, methods[family])()
+        service = ScoringService(bundle_from_modeler(
+            var_map, value_map, preprocessor, modeler, model))
+
+        latencies = []
+        for record in records:
+            start = time.perf_counter()
+            service.score(record)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        scores = [j for i in range(0, len(records), batch_size)
+                  for j in service.score_batch(records[i:i + batch_size])]
+        seconds = time.perf_counter() - start
+
+        rows.append({'family' : family, 'kind' : service.kind,
+                     'p50_ms' : np.percentile(latencies, 50) * 1000,
+                     'p99_ms' : np.percentile(latencies, 99) * 1000,
+                     'batch_rows_per_second' : len(records) / seconds,
+                     'max_difference' : np.abs(
+                         np.array(scores) - model.predict_proba(
+                             modeler.X_oot[:len(records)])[:, 1]).max()})
+
+    return pd.DataFrame(rows)
+
+
+#------------------------------------------------------------#
+# STEP 3: run                                                #
+#------------------------------------------------------------#
+
+if __name__ == '__main__':
+
+    df0, var_map0, value_map0 =\
+        Ingestor(r'C:\Users\JF13832\Downloads\Thesis\02 Data\01 Source\czech_mortgages_dataset_v2.csv',
+                 r'C:\Users\JF13832\Downloads\Thesis\02 Data\01 Source\mapping_tables.xlsx',
+                 r'C:\Users\JF13832\Downloads\Thesis\02 Data\02 Interim\cache').run()
+
+    df, var_map = DataGetter(df0, var_map0, value_map0).run()
+    df, memory_report = Compactor(df, var_map).run()
+
+    binning_scaling = benchmark_binning(df, 'default_event_flg', 201901)
+    print(binning_scaling)
+
+    transform_memory = benchmark_transform_memory(df, 'default_event_flg',
+                                                  201901)
+    print(transform_memory)
+
+    decorrelation_scaling = benchmark_decorrelation()
+    print(decorrelation_scaling)
+
+    df_train, df_test, df_oot, performance_summary =\
+        Preprocessor(130816, 'default_event_flg', df, False, False, 201901,
+                     'woe').run()
+    search_strategies = benchmark_search_strategies(df_train, df_test, df_oot,
+                                                    'default_event_flg')
+    print(search_strategies)
+
+    scoring_latency = benchmark_scoring_latency(df0, df, var_map, value_map0,
+                                                'default_event_flg', 201901)
+    print(scoring_latency)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+
+#------------------------------------------------------------#
+# STEP 1: general imports and paths                          #
+#------------------------------------------------------------#
+
+import os
+
+from Ingestor import Ingestor
+from DataGetter import DataGetter
+from Monitor import Monitor
+
+#------------------------------------------------------------#
+# STEP 2: run                                                #
+#------------------------------------------------------------#
+
+if __name__ == '__main__':
+
+    partition_dir = r'C:\Users\JF13832\Downloads\Thesis\02 Data\02 Interim\partitions'
+
+    # A delivery holds the newly arrived months, the first one the whole
+    #  source file. It is parsed once into the monthly partitions.
+    ingestor = Ingestor(r'C:\Users\JF13832\Downloads\Thesis\02 Data\01 Source\czech_mortgages_delivery.csv',
+                        r'C:\Users\JF13832\Downloads\Thesis\02 Data\01 Source\mapping_tables.xlsx',
+                        r'C:\Users\JF13832\Downloads\Thesis\02 Data\02 Interim\cache')
+    if os.path.exists(ingestor.data_path):
+        ingestor.run()
+        ingestor.write_partitions(partition_dir)
+    else:
+        ingestor.load_var_map()
+        ingestor.load_value_map()
+        ingestor.build_dtypes()
+
+    monitor = Monitor(r'C:\Users\JF13832\Downloads\Thesis\03 Models\registry',
+                      r'C:\Users\JF13832\Downloads\Thesis\03 Models\monitoring')
+
+    # Only the partitions of the months which are not monitored yet, or
+    #  whose targets were immature, are read.
+    all_months = ingestor.partition_months(partition_dir)
+    months = monitor.new_months(all_months)
+    if len(months) > 0:
+        df0 = ingestor.load_partitions(partition_dir, months)
+        df, var_map = DataGetter(df0, ingestor.var_map,
+                                 ingestor.value_map).run()
+        results = monitor.update(df)
+        print(results)
+
+    # Stability of the out of time months against the development months.
+    stability = monitor.population_stability(
+        reference_months = [i for i in all_months if i < 201901])
+    print(stability.pivot_table(index = ['model', 'month'],
+                                columns = 'variable', values = 'value'))
@@ -13,35 +13,58 @@ import pandas as pd
 # Save model.
 from joblib import dump, load
 
-# Load dataset.
-df0 = pd.read_csv(r'C:\Users\JF13832\Downloads\Thesis\02 Data\01 Source\czech_mortgages_dataset_v2.csv', 
-                  decimal = ',',
-                  delimiter = '|',
-                  encoding = 'cp437')
+# Load dataset, variable name mapping and value mapping datasets. The source
+#  text file is parsed only once, later runs reload the columnar cache.
+from Ingestor import Ingestor
 
-# Variable name mapping dataset.
-var_map0 = pd.read_excel(r'C:\Users\JF13832\Downloads\Thesis\02 Data\01 Source\mapping_tables.xlsx',
-                         sheet_name = 'variables')
+df0, var_map0, value_map0 =\
+    Ingestor(r'C:\Users\JF13832\Downloads\Thesis\02 Data\01 Source\czech_mortgages_dataset_v2.csv',
+             r'C:\Users\JF13832\Downloads\Thesis\02 Data\01 Source\mapping_tables.xlsx',
+             r'C:\Users\JF13832\Downloads\Thesis\02 Data\02 Interim\cache').run()
 
 #------------------------------------------------------------#
 # STEP 2: run                                                #
 #------------------------------------------------------------#
 
 from DataGetter import DataGetter
+from Compactor import Compactor
 from Preprocessor import Preprocessor
 from Modeler import Modeler
 from Validator import Validator
+from StageCache import StageCache
 
 from sklearn.linear_model import LogisticRegression
 
-def run(df_in, var_map_in, set_seed, target, undersample, decorrelate, oot_year, 
-        encoding_metric, selection_metric, select_features_bool):
+# Outputs of DataGetter and Preprocessor, reused by reruns with equal inputs.
+cache0 = StageCache(r'C:\Users\JF13832\Downloads\Thesis\02 Data\02 Interim\stages',
+                    max_bytes = 50 * 2**30)
+
+def run(df_in, var_map_in, value_map_in, set_seed, target, undersample,
+        decorrelate, oot_year, encoding_metric, selection_metric,
+        select_features_bool, cache = cache0):
     
-    df, var_map = DataGetter(df_in, var_map_in).run()
+    # DataGetter edits the mapping table, a copy keeps the key stable.
+    key = cache.key(DataGetter, Compactor, df_in, var_map_in, value_map_in)
+    if cache.has(key):
+        df, var_map = cache.load(key)
+    else:
+        df, var_map = DataGetter(df_in, var_map_in.copy(), value_map_in).run()
+        df, memory_report = Compactor(df, var_map).run()
+        cache.dump(key, (df, var_map))
     
-    df_train, df_test, df_oot, performance_summary =\
-        Preprocessor(set_seed, target, df, undersample, decorrelate,
-                     oot_year, encoding_metric).run()
+    # The key of the next stage chains on the key of its input data.
+    key = cache.key(Preprocessor, key, set_seed, target, undersample,
+                    decorrelate, oot_year, encoding_metric)
+    if cache.has(key):
+        (df_train, df_test, df_oot, performance_summary,
+         binning_process) = cache.load(key)
+    else:
+        preprocessor = Preprocessor(set_seed, target, df, undersample,
+                                    decorrelate, oot_year, encoding_metric)
+        df_train, df_test, df_oot, performance_summary = preprocessor.run()
+        binning_process = preprocessor.binning_process
+        cache.dump(key, (df_train, df_test, df_oot, performance_summary,
+                         binning_process))
     
     (logit, ann, knn, svm, bag, rf, adaboost,
      X_train, X_test, X_oot, y_train, y_test, y_oot) =\
@@ -58,7 +81,7 @@ def run(df_in, var_map_in, set_seed, target, undersample, decorrelate, oot_year,
 
 # Single run.
 (logit, ann, knn, svm,
- bag, rf, adaboost, aucs) = run(df0, var_map0, 130816,
+ bag, rf, adaboost, aucs) = run(df0, var_map0, value_map0, 130816,
                                 'default_event_flg', False, False, 201901,
                                 'bins', LogisticRegression(), False)
 
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+
+#------------------------------------------------------------#
+# STEP 1: general imports and paths                          #
+#------------------------------------------------------------#
+
+# Data manipulation.
+import pandas as pd
+
+from sklearn.linear_model import LogisticRegression
+
+from Ingestor import Ingestor
+from DataGetter import DataGetter
+from Compactor import Compactor
+from ScenarioRunner import ScenarioRunner
+
+#------------------------------------------------------------#
+# STEP 2: run                                                #
+#------------------------------------------------------------#
+
+# The scenarios run in worker processes, which import this file again on
+#  Windows. The guard keeps them from re-running the grid.
+if __name__ == '__main__':
+
+    df0, var_map0, value_map0 =\
+        Ingestor(r'C:\Users\JF13832\Downloads\Thesis\02 Data\01 Source\czech_mortgages_dataset_v2.csv',
+                 r'C:\Users\JF13832\Downloads\Thesis\02 Data\01 Source\mapping_tables.xlsx',
+                 r'C:\Users\JF13832\Downloads\Thesis\02 Data\02 Interim\cache').run()
+
+    # Shared by all scenarios, computed once.
+    df, var_map = DataGetter(df0, var_map0, value_map0).run()
+    df, memory_report = Compactor(df, var_map).run()
+
+    # Grid of scenarios, numbered in the order of itertools.product.
+    grid = {
+        'set_seed' : [130816],
+        'undersample' : [False, True],
+        'decorrelate' : [False, True],
+        'oot_year' : [201901],
+        'encoding_metric' : ['woe', 'bins'],
+        'select_features_bool' : [False]
+        }
+
+    aucs = ScenarioRunner(df, 'default_event_flg', LogisticRegression(),
+                          n_cores = 32,
+                          model_dir = r'C:\Users\JF13832\Downloads\Thesis\03 Models',
+                          var_map = var_map, value_map = value_map0)\
+        .run(grid)
+    
+    print(aucs)
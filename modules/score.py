@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+
+#------------------------------------------------------------#
+# STEP 1: general imports and paths                          #
+#------------------------------------------------------------#
+
+import sys
+import json
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ScoringService import load_service
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+def score_payload(service, payload):
+    ''' The function scores one loan, a json object, or a micro-batch, a
+        json list of objects.
+        '''
+
+    if isinstance(payload, list):
+        return {'pd' : service.score_batch(payload)}
+
+    return {'pd' : service.score(payload)}
+
+
+def make_handler(service):
+
+    class ScoringHandler(BaseHTTPRequestHandler):
+
+
+        def do_POST(self):
+
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.dumps(score_payload(
+                    service, json.loads(self.rfile.read(length)))).encode()
+                self.send_response(200)
+            except (ValueError, TypeError, KeyError) as error:
+                body = json.dumps({'error' : str(error)}).encode()
+                self.send_response(400)
+
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+        def log_message(self, format, *args):
+
+            # A line per request would cost more than the scoring.
+            pass
+
+    return ScoringHandler
+
+
+def serve_stdin(service):
+    ''' The function scores json lines of stdin, a loan or a micro-batch per
+        line, and writes a json line per input line to stdout.
+        '''
+
+    for line in sys.stdin:
+        if line.strip():
+            sys.stdout.write(json.dumps(score_payload(service,
+                                                      json.loads(line))) + '\n')
+            sys.stdout.flush()
+
+#------------------------------------------------------------#
+# STEP 3: run                                                #
+#------------------------------------------------------------#
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('bundle_path',
+                        help = 'bundle.joblib of a registered model')
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 8080)
+    parser.add_argument('--stdin', action = 'store_true',
+                        help = 'score json lines of stdin instead of http')
+    args = parser.parse_args()
+
+    # The bundle is loaded once, the hot path uses no pandas.
+    service = load_service(args.bundle_path)
+
+    if args.stdin:
+        serve_stdin(service)
+    else:
+        ThreadingHTTPServer((args.host, args.port),
+                            make_handler(service)).serve_forever()
@@ -4,46 +4,34 @@
 
 ''' setup '''
 
-import pandas as pd
-from optbinning import OptimalBinning
-
+from Ingestor import Ingestor
 from DataGetter import DataGetter
-from Preprocessor import Preprocessor
-
-df0 = pd.read_csv(r'C:\Users\JF13832\Downloads\Thesis\02 Data\01 Source\czech_mortgages_dataset_v2.csv', 
-                  decimal = ',',
-                  delimiter = '|',
-                  encoding = 'cp437')
+from Compactor import Compactor
+from BinningExplorer import BinningExplorer
 
-# Variable name mapping dataset.
-var_map0 = pd.read_excel(r'C:\Users\JF13832\Downloads\Thesis\02 Data\01 Source\mapping_tables.xlsx',
-                         sheet_name = 'variables')
+# Dataset, variable name mapping and value mapping datasets.
+df0, var_map0, value_map0 =\
+    Ingestor(r'C:\Users\JF13832\Downloads\Thesis\02 Data\01 Source\czech_mortgages_dataset_v2.csv',
+             r'C:\Users\JF13832\Downloads\Thesis\02 Data\01 Source\mapping_tables.xlsx',
+             r'C:\Users\JF13832\Downloads\Thesis\02 Data\02 Interim\cache').run()
 
 ''' definition '''
 
-def bin_univariate(df_in, var_map_in, x_name, dtype):
-    df, var_map = DataGetter(df_in, var_map_in).run()
-    
-    df_train, df_test, df_oot, performance_summary =\
-        Preprocessor(130816, 'default_event_flg', df, False, True,
-                     201901, 'woe').run()
+df, var_map = DataGetter(df0, var_map0, value_map0).run()
+df, memory_report = Compactor(df, var_map).run()
 
-    x = df_train[x_name].values
-    y = df_train['default_event_flg'].values
-    
-    optb = OptimalBinning(name=x_name, dtype=dtype, solver="cp")
-    optb.fit(x, y)
-    optb.status
-    optb.splits
-    binning_table = optb.binning_table
-    binning_table.build()
-    binning_table.plot(metric="woe", show_bin_labels =True)
-    #binning_table.plot(metric="event_rate")
-
-
-bin_univariate(df0, var_map0, 'behavioral_score', 'numerical')
-bin_univariate(df0, var_map0, 'application_score', 'numerical')    
-bin_univariate(df0, var_map0, 'age', 'categorical')    
-bin_univariate(df0, var_map0, 'dsti_ratio', 'categorical')    
-bin_univariate(df0, var_map0, 'ltv_at_loan_origination_ratio', 'categorical')    
+# The training sample is prepared once, the variables are binned in parallel.
+explorer = BinningExplorer(130816, 'default_event_flg', df, False, 201901)
+
+binning_tables = explorer.run({
+    'behavioral_score' : 'numerical',
+    'application_score' : 'numerical',
+    'age' : 'categorical',
+    'dsti_ratio' : 'categorical',
+    'ltv_at_loan_origination_ratio' : 'categorical'
+    })
 
+for name, optb in explorer.binned.items():
+    optb.binning_table.plot(metric="woe", show_bin_labels =True)
+    #optb.binning_table.plot(metric="event_rate")
+    
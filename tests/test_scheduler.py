@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+
+#------------------------------------------------------------#
+# STEP 1: libraries                                          #
+#------------------------------------------------------------#
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'classes'))
+
+from Modeler import Modeler
+
+#------------------------------------------------------------#
+# STEP 2: definitions                                        #
+#------------------------------------------------------------#
+
+
+def make_sample(n, set_seed):
+
+    rng = np.random.default_rng(set_seed)
+    df = pd.DataFrame(rng.normal(size = (n, 4)),
+                      columns = [f'woe_{i}' for i in range(4)])
+    z = df.sum(axis = 1) + rng.normal(size = n)
+    df['default_event_flg'] = (z > 1).astype(int)
+
+    return df
+
+
+class SmallModeler(Modeler):
+    ''' Modeler with the first two values of every hyperparameter, so that
+        the scheduler runs all families in a few seconds.
+        '''
+
+
+    def define_models(self):
+
+        models = {}
+        for name, (estimator, grid) in super().define_models().items():
+            if isinstance(grid, dict):
+                grid = {key : list(values)[:2] for key, values in grid.items()}
+            elif grid is not None:
+                grid = [{key : list(values)[:2] for key, values in i.items()}
+                        for i in grid]
+            models[name] = (estimator, grid)
+
+        return models
+
+
+class TestScheduleModels(unittest.TestCase):
+
+
+    def make_modeler(self, **kwargs):
+
+        return SmallModeler(1, 'default_event_flg', False,
+                            make_sample(300, 1), make_sample(100, 2),
+                            make_sample(100, 3), n_jobs = 2, **kwargs)
+
+
+    def test_schedule_models(self):
+
+        modeler = self.make_modeler()
+        models = modeler.run(None, False, 'woe', schedule = True)
+
+        for model in models[:7]:
+            proba = model.predict_proba(modeler.X_test)
+            self.assertEqual(proba.shape, (len(modeler.X_test), 2))
+        self.assertTrue(hasattr(modeler.svm.best_estimator_,
+                                'calibrated_classifiers_'))
+
+        # The joblib pools after the scheduler still work.
+        self.assertEqual(Parallel(n_jobs = 2)(delayed(abs)(-i)
+                                              for i in range(4)),
+                         [0, 1, 2, 3])
+
+
+    def test_schedule_other_search(self):
+
+        modeler = self.make_modeler(search_strategy = 'halving')
+        with self.assertRaises(ValueError):
+            modeler.run(None, False, 'woe', schedule = True)
+
+
+if __name__ == '__main__':
+    unittest.main()